@@ -0,0 +1,83 @@
+"""Benchmark of the float and the exact (fixed-point) arithmetic.
+
+    $ python benchmarks/exact.py --transactions 10000 1000000
+
+The same synthetic transaction history is calculated in both modes, the best
+of `--repeat` runs of building the ledger and of the tax liability for every
+year is reported together with how far the float results drift from the
+exact ones.
+"""
+import argparse
+from pathlib import Path
+import sys
+from time import perf_counter
+
+import numpy as np
+
+root_path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_path))
+
+from ledgers import PATTERNS, synthetic_transactions
+
+from src.cit.calculation import build_ledger, calculate_skatteverket_for_years
+from src.cit.config import Config
+
+
+def _best(call, repeat: int) -> tuple[float, object]:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        rv = call()
+        timings.append(perf_counter() - start)
+    return min(timings), rv
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--transactions", nargs="+", default=[10_000, 1_000_000], type=int
+    )
+    parser.add_argument("--pattern", default="random", choices=PATTERNS)
+    parser.add_argument("--repeat", default=3, type=int)
+    args = parser.parse_args()
+
+    print(
+        f"{'transactions':>12} {'mode':>6} {'ledger (s)':>11} {'tax (s)':>9} "
+        f"{'held drift':>11} {'taxable drift':>14}"
+    )
+    for n in args.transactions:
+        results = {}
+        for mode in ["float", "exact"]:
+            c = Config(_EXACT=mode == "exact")
+            # NOTE: The transactions are rounded like by `load_input_files`.
+            df = (
+                synthetic_transactions(n, c, pattern=args.pattern)
+                .set_index(c._DATE)
+                .round({c._AMOUNT: 6, c._PRICE: 2, c._FX_RATE: 2})
+            )
+            years = sorted(df.index.year.unique())
+
+            ledger_seconds, ledger = _best(lambda: build_ledger(df, c), args.repeat)
+            tax_seconds, df_tax = _best(
+                lambda: calculate_skatteverket_for_years(years, ledger, c, False),
+                args.repeat,
+            )
+            results[mode] = (ledger, df_tax)
+
+            # NOTE: The drift is the largest difference from the exact mode of
+            # the amount held and of the yearly taxable amount.
+            held_drift = np.abs(
+                ledger.transactions[c._HELD_AMOUNT].to_numpy()
+                - results["float"][0].transactions[c._HELD_AMOUNT].to_numpy()
+            ).max()
+            taxable_drift = np.abs(
+                df_tax["Taxable"].to_numpy() - results["float"][1]["Taxable"].to_numpy()
+            ).max()
+            print(
+                f"{n:>12} {mode:>6} {ledger_seconds:>11.3f} {tax_seconds:>9.3f} "
+                f"{held_drift:>11.2e} {taxable_drift:>14.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
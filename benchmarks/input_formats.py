@@ -0,0 +1,84 @@
+"""Benchmark of reading transactions from JSON and from columnar input files.
+
+    $ python benchmarks/input_formats.py --transactions 1000000
+
+The same synthetic transaction history (complete data) is written in every
+input format and read with `read_transactions_file`, the best of `--repeat`
+runs is reported per format.
+"""
+import argparse
+import json
+from pathlib import Path
+import sys
+import tempfile
+from time import perf_counter
+
+from pandas import DataFrame
+
+root_path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_path))
+
+from ledgers import synthetic_transactions
+
+from src.cit.config import Config
+from src.cit.io import read_transactions_file
+
+
+def write_input_files(df: DataFrame, directory: Path, c: Config) -> list[Path]:
+    metadata = {c._ASSET: "BTC-USD", c._ASSET_CURRENCY: "USD"}
+    filenames = [directory / "transactions.json"]
+    with open(filenames[0], "w") as fhandle:
+        json.dump(
+            {
+                **metadata,
+                c._TRANSACTIONS: df.astype({c._DATE: str}).to_dict(orient="records"),
+            },
+            fhandle,
+        )
+
+    try:
+        import pyarrow as pa
+        from pyarrow import feather, parquet
+    except ImportError:
+        print("pyarrow isn't installed, only the JSON input file is read")
+        return filenames
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(metadata)
+    parquet.write_table(table, directory / "transactions.parquet")
+    feather.write_feather(table, directory / "transactions.feather")
+    df.to_csv(directory / "transactions.csv", index=False)
+    with open(directory / "transactions.meta.json", "w") as fhandle:
+        json.dump(metadata, fhandle)
+    return [
+        *filenames,
+        directory / "transactions.parquet",
+        directory / "transactions.feather",
+        directory / "transactions.csv",
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", default=100_000, type=int)
+    parser.add_argument("--repeat", default=3, type=int)
+    args = parser.parse_args()
+
+    c = Config()
+    df = synthetic_transactions(args.transactions, c)
+    with tempfile.TemporaryDirectory() as directory:
+        for filename in write_input_files(df, Path(directory), c):
+            timings = []
+            for _ in range(args.repeat):
+                start = perf_counter()
+                read_transactions_file(filename, c)
+                timings.append(perf_counter() - start)
+            size = filename.stat().st_size / 2**20
+            print(
+                f"{filename.suffix:>9} {size:9.1f} MiB {min(timings):9.3f} s "
+                f"{args.transactions / min(timings):12,.0f} transactions/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
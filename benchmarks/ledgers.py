@@ -0,0 +1,115 @@
+"""Synthetic transaction histories (ledgers) for the benchmarks.
+
+The ledgers scale from a few to millions of transactions, have one of the
+buy/sell `PATTERNS` and can be split over several assets (input files).
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+from pandas import DataFrame, Timedelta, date_range
+
+from src.cit.config import Config
+from src.cit.prices import InMemoryProvider
+
+# NOTE: "accumulate" only buys, "alternate" buys twice and sells once, "random"
+# buys 60% and sells 40% of the time.
+PATTERNS = ["accumulate", "alternate", "random"]
+
+_START = "2010-01-01"
+
+
+def _amounts(n: int, pattern: str, rng: np.random.Generator) -> np.ndarray:
+    if pattern == "accumulate":
+        return rng.uniform(0.01, 0.1, n).round(6)
+    elif pattern == "alternate":
+        return np.where(np.arange(n) % 3 == 2, -0.01, 0.02)
+
+    is_buy = (rng.random(n) < 0.6) | (np.arange(n) == 0)
+    amounts = np.where(
+        is_buy, rng.uniform(0.01, 0.1, n), -rng.uniform(0.001, 0.05, n)
+    ).round(6)
+    # NOTE: The amount held never drops to zero or below, sells that would
+    # empty the position are turned into buys.
+    while (amounts.cumsum() <= 0).any():
+        i = np.argmax(amounts.cumsum() <= 0)
+        amounts[i] = -amounts[i]
+    return amounts
+
+
+def _frequency(n: int) -> str:
+    # NOTE: Large ledgers have many transactions per day, so that they span a
+    # realistic number of years.
+    return "D" if n <= 5_000 else "H" if n <= 100_000 else "min"
+
+
+def synthetic_transactions(
+    n: int, c: Config, pattern: str = "random", seed: int = 0
+) -> DataFrame:
+    """Returns `n` transactions with complete data in the columns of `c`."""
+    rng = np.random.default_rng(seed)
+    return DataFrame(
+        {
+            c._DATE: date_range(_START, periods=n, freq=_frequency(n)),
+            c._AMOUNT: _amounts(n, pattern, rng),
+            c._PRICE: rng.uniform(1_000, 100_000, n).round(2),
+            c._FX_RATE: rng.uniform(8, 12, n).round(4),
+        }
+    )
+
+
+def tickers(files: int) -> list[str]:
+    return [f"ASSET{i}-USD" for i in range(files)]
+
+
+def write_ledgers(
+    directory: Path,
+    n: int,
+    files: int,
+    c: Config,
+    pattern: str = "random",
+    complete: bool = True,
+) -> list[str]:
+    """Writes `n` transactions split over `files` JSON input files (one per asset).
+
+    Without `complete` the input files have basic data, i.e., only the dates
+    and the amounts.
+    """
+    filenames = []
+    for i, ticker in enumerate(tickers(files)):
+        df = synthetic_transactions(n // files, c, pattern=pattern, seed=i)
+        if not complete:
+            df = df.loc[:, [c._DATE, c._AMOUNT]]
+
+        filename = directory / f"{ticker}.json"
+        with open(filename, "w") as fhandle:
+            json.dump(
+                {
+                    c._ASSET: ticker,
+                    c._ASSET_CURRENCY: "USD",
+                    c._TRANSACTIONS: df.astype({c._DATE: str}).to_dict(
+                        orient="records"
+                    ),
+                },
+                fhandle,
+            )
+        filenames.append(str(filename))
+    return filenames
+
+
+def price_provider(n: int, files: int, c: Config) -> InMemoryProvider:
+    """Returns daily prices of every asset and of its FX rate to the domestic currency."""
+    end = date_range(_START, periods=max(n // files, 1), freq=_frequency(n // files))
+    days = date_range(_START, end[-1] + Timedelta(days=1), freq="D")
+    rng = np.random.default_rng(0)
+
+    def _prices(low: float, high: float) -> DataFrame:
+        close = rng.uniform(low, high, len(days))
+        return DataFrame({"Open": close, "Close": close}, index=days)
+
+    return InMemoryProvider(
+        {
+            f"{c._DOMESTIC_CURRENCY}USD=X": _prices(0.08, 0.12),
+            **{ticker: _prices(1_000, 100_000) for ticker in tickers(files)},
+        }
+    )
@@ -0,0 +1,73 @@
+"""Benchmark of the startup time of the CLI.
+
+    $ python benchmarks/startup.py --repeat 10
+
+Every command runs in a new interpreter, the best of `--repeat` runs is
+reported per command together with the heavy dependencies it imported.
+"""
+import argparse
+from pathlib import Path
+import subprocess
+import sys
+from time import perf_counter
+
+root_path = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    "help": ["--help"],
+    "calculate (complete)": [
+        "calculate",
+        "tax-liability",
+        "--in",
+        "skatteverket-example-1.json",
+    ],
+}
+
+HEAVY_DEPENDENCIES = ["yfinance", "tabulate", "pyarrow.parquet", "multiprocessing"]
+
+
+_LIST_MODULES = (
+    "import atexit, runpy, sys; "
+    "atexit.register(lambda: print(*sys.modules, file=sys.stderr)); "
+    "sys.argv = sys.argv[1:]; "
+    "runpy.run_path(sys.argv[0], run_name='__main__')"
+)
+
+
+def _imported_modules(args: list[str]) -> set[str]:
+    stderr = subprocess.run(
+        [sys.executable, "-c", _LIST_MODULES, "cit.py", *args],
+        cwd=root_path,
+        capture_output=True,
+        text=True,
+    ).stderr
+    return set(stderr.splitlines()[-1].split())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", default=5, type=int)
+    args = parser.parse_args()
+
+    for name, command in COMMANDS.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = perf_counter()
+            subprocess.run(
+                [sys.executable, "cit.py", *command],
+                cwd=root_path,
+                capture_output=True,
+                check=True,
+            )
+            timings.append(perf_counter() - start)
+
+        modules = _imported_modules(command)
+        imported = [module for module in HEAVY_DEPENDENCIES if module in modules]
+        print(
+            f"{name:>22} {min(timings):7.3f} s "
+            f"(imports: {', '.join(imported) or 'none of the heavy dependencies'})"
+        )
+
+
+if __name__ == "__main__":
+    main()
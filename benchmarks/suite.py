@@ -0,0 +1,270 @@
+"""Benchmark suite of the public functions in `src/cit`.
+
+    $ python benchmarks/suite.py --transactions 10 1000 100000 --files 1 4
+    $ python benchmarks/suite.py --filter calculate_ --json results.json
+
+Every benchmark runs on synthetic ledgers (see `ledgers.py`) of each number of
+transactions and files. The best wall time of `--repeat` runs and the peak
+memory allocated during one run (traced with `tracemalloc`) are reported, so
+that the scaling of each function with the length of the history shows up.
+"""
+import argparse
+from dataclasses import replace
+from functools import cached_property, partial
+import json
+from pathlib import Path
+import sys
+import tempfile
+from time import perf_counter
+import tracemalloc
+from typing import Callable
+
+root_path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_path))
+
+from ledgers import PATTERNS, price_provider, write_ledgers
+
+from src.cit import calculation, formatting, io
+from src.cit.config import Config
+
+
+class Workload:
+    """Ledgers of `n` transactions in `files` input files and the data derived
+    from them, each prepared once and shared by the benchmarks."""
+
+    def __init__(self, n: int, files: int, pattern: str, directory: Path) -> None:
+        self.n, self.files, self.pattern = n, files, pattern
+        self.directory = directory
+        self.c = Config(_DATA_PATH=str(directory), _CACHE_PATH=None)
+        self.c._PRICES = price_provider(n, files, self.c)
+
+    def _write(self, name: str, complete: bool) -> list[str]:
+        directory = self.directory / name
+        directory.mkdir()
+        return write_ledgers(
+            directory, self.n, self.files, self.c, self.pattern, complete
+        )
+
+    @cached_property
+    def complete_files(self) -> list[str]:
+        return self._write("complete", complete=True)
+
+    @cached_property
+    def basic_files(self) -> list[str]:
+        return self._write("basic", complete=False)
+
+    @cached_property
+    def d(self) -> dict:
+        return io.read_json(self.complete_files[0])
+
+    @cached_property
+    def df_basic(self):
+        return io.read_transactions_file(self.basic_files[0], self.c)[1]
+
+    @cached_property
+    def df(self):
+        return io.read_input_files(self.complete_files, self.c)
+
+    @cached_property
+    def ledger(self) -> calculation.Ledger:
+        return calculation.build_ledger(self.df, self.c)
+
+    @cached_property
+    def checkpoint(self) -> calculation.Checkpoint:
+        # NOTE: The checkpoint misses the last transactions, like after a day
+        # of new transactions.
+        ledger = calculation.build_ledger(
+            self.df.iloc[: -max(self.n // 100, 1)], self.c
+        )
+        return calculation.create_checkpoint(ledger, self.c)
+
+    @cached_property
+    def years(self) -> list[int]:
+        return sorted(self.df.index.year.unique())
+
+    @cached_property
+    def pnl(self) -> formatting.Report:
+        df = calculation.calculate_PNL_for_years(self.years, self.ledger, self.c, True)
+        return formatting.Report(df=df, title="PROFIT AND LOSS", m={}, index=True)
+
+    @cached_property
+    def prices(self):
+        asset = self.d[self.c._ASSET]
+        return self.c._PRICES.prices[asset]
+
+    def config(self, input_file: str) -> Config:
+        return replace(self.c, _INPUT_FILE=input_file)
+
+
+def _write_to(directory: Path, write: Callable, *args) -> None:
+    with open(directory / "output", "w") as f:
+        write(*args, f)
+
+
+# NOTE: Every benchmark prepares its arguments from a workload and returns the
+# call to measure.
+BENCHMARKS: dict[str, Callable[[Workload], Callable]] = {
+    "calculation.calculate_acquisition_prices": lambda w: partial(
+        calculation.calculate_acquisition_prices, w.df, w.c
+    ),
+    "calculation.build_ledger": lambda w: partial(calculation.build_ledger, w.df, w.c),
+    "calculation.build_ledger (checkpoint)": lambda w: partial(
+        calculation.build_ledger, w.df, w.c, checkpoint=w.checkpoint
+    ),
+    "calculation.create_checkpoint": lambda w: partial(
+        calculation.create_checkpoint, w.ledger, w.c
+    ),
+    "calculation.calculate_statistics": lambda w: partial(
+        calculation.calculate_statistics, w.years[-1], w.ledger, w.c, True
+    ),
+    "calculation.calculate_statistics_for_years": lambda w: partial(
+        calculation.calculate_statistics_for_years, w.years, w.ledger, w.c, True
+    ),
+    "calculation.calculate_PNL": lambda w: partial(
+        calculation.calculate_PNL, w.ledger, w.c, False
+    ),
+    "calculation.calculate_PNL_per_year": lambda w: partial(
+        calculation.calculate_PNL_per_year, w.years[-1], w.ledger, w.c, False
+    ),
+    "calculation.calculate_PNL_for_years": lambda w: partial(
+        calculation.calculate_PNL_for_years, w.years, w.ledger, w.c, False
+    ),
+    "calculation.calculate_skatteverket": lambda w: partial(
+        calculation.calculate_skatteverket, w.years[-1], w.ledger, w.c, False
+    ),
+    "calculation.calculate_skatteverket_for_years": lambda w: partial(
+        calculation.calculate_skatteverket_for_years, w.years, w.ledger, w.c, False
+    ),
+    "calculation.calculate_forex_transactions": lambda w: partial(
+        calculation.calculate_forex_transactions, w.df, w.c
+    ),
+    "io.read_json": lambda w: partial(io.read_json, w.complete_files[0]),
+    "io.read_json_with_config": lambda w: partial(
+        io.read_json_with_config, w.config(w.complete_files[0])
+    ),
+    "io.check_transaction_data_type": lambda w: partial(
+        io.check_transaction_data_type, w.d[w.c._TRANSACTIONS], w.c
+    ),
+    "io.is_input_file": lambda w: partial(io.is_input_file, Path(w.complete_files[0])),
+    "io.read_transactions_file": lambda w: partial(
+        io.read_transactions_file, w.complete_files[0], w.c
+    ),
+    "io.frame_transactions": lambda w: partial(io.frame_transactions, w.d, w.c),
+    "io.compute_mid_prices": lambda w: partial(io.compute_mid_prices, w.prices),
+    "io.download": lambda w: partial(
+        io.download,
+        w.d[w.c._ASSET],
+        w.prices.index[0].to_pydatetime(),
+        w.prices.index[-1].to_pydatetime(),
+        w.c,
+    ),
+    "io.fetch_market_data": lambda w: partial(
+        io.fetch_market_data, {w.d[w.c._ASSET]: w.df_basic.index}, w.c
+    ),
+    "io.complement_basic_data": lambda w: partial(
+        io.complement_basic_data,
+        w.d[w.c._ASSET],
+        w.c._DOMESTIC_CURRENCY,
+        w.df_basic,
+        w.c,
+    ),
+    "io.read_in_transactions": lambda w: partial(
+        io.read_in_transactions, w.config(w.basic_files[0])
+    ),
+    "io.load_input_files": lambda w: partial(io.load_input_files, w.basic_files, w.c),
+    "io.read_input_files": lambda w: partial(
+        io.read_input_files, w.complete_files, w.c
+    ),
+    "io.export_json": lambda w: partial(
+        io.export_json,
+        w.directory / "forex.json",
+        calculation.calculate_forex_transactions(w.df, w.c),
+        w.c,
+    ),
+    "io.save_checkpoint": lambda w: partial(
+        io.save_checkpoint, w.directory / "checkpoint.npz", w.checkpoint
+    ),
+    "io.load_checkpoint": lambda w: (
+        io.save_checkpoint(w.directory / "checkpoint.npz", w.checkpoint),
+        partial(io.load_checkpoint, w.directory / "checkpoint.npz"),
+    )[1],
+    "formatting.format_DF": lambda w: partial(
+        formatting.format_DF, w.pnl.df, w.pnl.title, w.pnl.m, w.pnl.index
+    ),
+    "formatting.write_report (csv)": lambda w: partial(
+        _write_to, w.directory, partial(formatting.write_report, w.pnl, "csv")
+    ),
+}
+
+
+def measure(call: Callable, repeat: int) -> tuple[float, int]:
+    """Returns the best wall time (in seconds) and the peak of traced memory
+    (in bytes) of `call`."""
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        call()
+        timings.append(perf_counter() - start)
+
+    # NOTE: Tracing the memory slows down the call, therefore, the memory is
+    # measured in a separate run.
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--transactions", nargs="+", default=[10, 1_000, 100_000], type=int
+    )
+    parser.add_argument("--files", nargs="+", default=[1], type=int)
+    parser.add_argument("--pattern", default="random", choices=PATTERNS)
+    parser.add_argument("--repeat", default=3, type=int)
+    parser.add_argument(
+        "--filter", nargs="+", default=[], help="run only the matching benchmarks"
+    )
+    parser.add_argument("--json", type=str, help="write the results to a JSON file")
+    args = parser.parse_args()
+
+    benchmarks = {
+        name: benchmark
+        for name, benchmark in BENCHMARKS.items()
+        if not args.filter or any(pattern in name for pattern in args.filter)
+    }
+
+    results = []
+    print(
+        f"{'benchmark':<48} {'transactions':>12} {'files':>5} {'time (s)':>10} {'peak (MiB)':>10}"
+    )
+    for n in args.transactions:
+        for files in args.files:
+            with tempfile.TemporaryDirectory() as directory:
+                workload = Workload(n, files, args.pattern, Path(directory))
+                for name, benchmark in benchmarks.items():
+                    seconds, peak = measure(benchmark(workload), args.repeat)
+                    results.append(
+                        {
+                            "benchmark": name,
+                            "transactions": n,
+                            "files": files,
+                            "pattern": args.pattern,
+                            "seconds": seconds,
+                            "peak_memory": peak,
+                        }
+                    )
+                    print(
+                        f"{name:<48} {n:>12} {files:>5} {seconds:>10.4f} {peak / 2**20:>10.2f}"
+                    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
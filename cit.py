@@ -1,17 +1,56 @@
 import argparse
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from dataclasses import replace
+from datetime import date
+from functools import partial
+from io import BytesIO, StringIO, TextIOWrapper
+import json
 from numbers import Real as R
+import os
+from pathlib import Path
+import signal
+import sys
+from time import perf_counter
+from typing import IO, Iterable, Iterator
 
-from pandas import DataFrame
+from pandas import DataFrame, date_range, Timestamp
 
+from src.cit import profiling
 from src.cit.calculation import (
+    Ledger,
+    build_ledger,
     calculate_forex_transactions,
+    calculate_PNL_for_years,
     calculate_PNL_per_year,
+    combine_forex_transactions,
     calculate_skatteverket,
+    calculate_skatteverket_for_years,
+    create_checkpoint,
     calculate_statistics,
+    calculate_statistics_at,
+    calculate_statistics_for_years,
+    iter_PNL,
 )
+from src.cit.cache import INPUT_CACHE_SUFFIX, opened_market_data_caches
 from src.cit.config import Config
-from src.cit.formatting import format_DF
-from src.cit.io import export_json, read_json_with_config, read_input_files
+from src.cit.formatting import (
+    FORMATS,
+    STREAM_FORMATS,
+    TABLE,
+    Report,
+    write_records,
+    write_report,
+)
+from src.cit.io import (
+    Dataset,
+    export_json,
+    is_input_file,
+    load_checkpoint,
+    load_input_files,
+    read_json,
+    save_checkpoint,
+    stream_input_files,
+)
 
 _PROGRAM_NAME = "cit"
 
@@ -19,11 +58,102 @@ _DESCRIPTION = (
     "CIT is a minimalistic Capital Income Tax calculator for cryptocurrencies."
 )
 
+_ALL_YEARS = "all"
+
+_BATCH_REPORTS = ["summary", "profit-and-loss", "tax-liability", "forex-transactions"]
+
+_BATCH_INDEX = "index.json"
+
+_PERIOD_ENDS = {"month-ends": "M", "quarter-ends": "Q"}
+
+_SERVE_COMMANDS = ["transactions", "forex-transactions", "calculate"]
+
+_CONTENT_TYPES = {
+    TABLE: "text/plain; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _financial_years(value: str) -> int | list[int] | str:
+    if value == _ALL_YEARS:
+        return _ALL_YEARS
+    try:
+        if "-" in value:
+            start, end = value.split("-")
+            years = list(range(int(start), int(end) + 1))
+        else:
+            return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid year: '{value}' (use e.g. 2021, 2018-2025 or {_ALL_YEARS})"
+        )
+    if not years:
+        raise argparse.ArgumentTypeError(
+            f"invalid range of years: '{value}' (the first year is after the last)"
+        )
+    return years
+
+
+def _snapshot_date(value: str) -> str:
+    if value in _PERIOD_ENDS:
+        return value
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid date: '{value}' (use e.g. 2022-06-30, {' or '.join(_PERIOD_ENDS)})"
+        )
+    return value
+
+
+def _snapshot_dates(values: list[str], years: list[int]) -> list[Timestamp]:
+    # NOTE: The period ends are those of the financial years.
+    dates = []
+    for value in values:
+        if value in _PERIOD_ENDS:
+            dates.extend(
+                date_range(
+                    Timestamp(years[0], 1, 1),
+                    Timestamp(years[-1], 12, 31),
+                    freq=_PERIOD_ENDS[value],
+                )
+            )
+        else:
+            dates.append(Timestamp(value))
+    return sorted(set(dates))
+
+
+def _label(values: Iterable[str]) -> str:
+    return ", ".join(dict.fromkeys(values))
+
+
+def _asset_currencies(dataset: Dataset) -> list[str]:
+    return [input_file.asset_currency for input_file in dataset.files]
+
+
+def _show_assets(df: DataFrame) -> DataFrame:
+    # NOTE: The asset of each transaction is shown only when there is more
+    # than one asset.
+    df = df.drop(columns=config._ASSET_CURRENCY)
+    if df[config._ASSET].nunique() > 1:
+        return df.loc[:, [config._ASSET, *df.columns.drop(config._ASSET)]]
+    else:
+        return df.drop(columns=config._ASSET)
+
 
 def list_transactions(args):
     global config
 
-    df = read_input_files(args.FILES, config)
+    config._PRICES = args.prices
+    report = _list_transactions(load_input_files(args.FILES, config), args)
+    write_report(report, args.format, sys.stdout)
+
+
+def _list_transactions(dataset: Dataset, args) -> Report:
+    df = dataset.transactions
 
     if args.ccy:
         df = df.assign(
@@ -33,14 +163,19 @@ def list_transactions(args):
         pass
 
     if args.year:
-        df = df.loc[df.index.year == args.year]
+        # NOTE: The transactions are sorted by date, the year is found by a
+        # binary search instead of a mask over every transaction.
+        start, stop = df.index.searchsorted(
+            [Timestamp(args.year, 1, 1), Timestamp(args.year + 1, 1, 1)]
+        )
+        df = df.iloc[start:stop]
     else:
         pass
-    df.index = df.index.date
+    df = df.set_axis(df.index.date)
 
-    d = read_json_with_config(config)
-    asset = d[config._ASSET]
-    asset_currency = d[config._ASSET_CURRENCY]
+    asset = _label(df[config._ASSET])
+    asset_currency = _label(_asset_currencies(dataset))
+    df = _show_assets(df)
     domestic_currency = config._DOMESTIC_CURRENCY
     column_map = {
         config._AMOUNT: config._AMOUNT.capitalize(),
@@ -53,35 +188,53 @@ def list_transactions(args):
         df = df
         title = f"{asset.upper()} TRANSACTIONS"
     elif args.mode == "buy":
-        df = df.query(f"{config._AMOUNT} > 0")
+        df = df.loc[df[config._AMOUNT].to_numpy() > 0]
         title = f"{asset.upper()} BUY TRANSACTIONS"
     elif args.mode == "sell":
-        df = df.query(f"{config._AMOUNT} < 0")
+        df = df.loc[df[config._AMOUNT].to_numpy() < 0]
         title = f"{asset.upper()} SELL TRANSACTIONS"
 
-    print(
-        format_DF(
-            df=df,
-            title=title,
-            m=column_map,
-            index=True,
-        )
+    return Report(
+        df=df,
+        title=title,
+        m=column_map,
+        index=True,
     )
 
 
 def forex_transactions(args):
     global config
 
-    df = read_input_files(args.FILES, config)
+    config._PRICES = args.prices
+    # NOTE: `--out` writes the FX transactions as an input file, the combined
+    # transactions of several assets don't fit in one.
+    if args.combined and args.out:
+        print("ValueError: --out writes only the FX transactions, without --combined")
+        raise SystemExit(1)
+    report = _forex_transactions(load_input_files(args.FILES, config), args)
+    write_report(report, args.format, sys.stdout)
+
+
+def _forex_transactions(dataset: Dataset, args, ledgers: dict | None = None) -> Report:
+    if args.combined:
+        # NOTE: The tax liability of the assets and of the FX transactions is
+        # reported in the domestic currency, as Skatteverket requires.
+        df = combine_forex_transactions(dataset.transactions, config)
+        report_args = argparse.Namespace(
+            mode="tax-liability", year=args.year, ccy=False, checkpoint=None
+        )
+        if ledgers is not None:
+            ledgers = ledgers.setdefault("combined", {})
+        return _calculate(Dataset(df, dataset.files), report_args, ledgers)
+
+    asset_currency = _label(_asset_currencies(dataset))
 
-    df = calculate_forex_transactions(df, config)
+    df = calculate_forex_transactions(dataset.transactions, config)
 
     if args.out:
         filename = args.out
         export_json(filename, df, config)
 
-    d = read_json_with_config(config)
-    asset_currency = d[config._ASSET_CURRENCY]
     domestic_currency = config._DOMESTIC_CURRENCY
     title = f"{asset_currency} TRANSACTIONS"
     column_map = {
@@ -91,74 +244,186 @@ def forex_transactions(args):
     }
 
     df.index = df.index.date
-    print(
-        format_DF(
-            df=df,
-            title=title,
-            m=column_map,
-            index=True,
-        )
+    return Report(
+        df=df,
+        title=title,
+        m=column_map,
+        index=True,
     )
 
 
+@contextmanager
+def _output(filename: str | None, fmt: str) -> Iterator[IO]:
+    if filename is None:
+        yield sys.stdout
+    elif fmt == "parquet":
+        with open(filename, "wb") as f:
+            yield f
+    else:
+        with open(filename, "w", encoding="utf-8") as f:
+            yield f
+
+
+def _currencies(asset_currencies: list[str], ccy: bool) -> tuple[str, str, str]:
+    # NOTE: Returns the asset price currency, the currency of the results and
+    # the FX ticker shown in the reports.
+    asset_currency = _label(asset_currencies)
+    domestic_currency = config._DOMESTIC_CURRENCY
+    if not ccy:
+        currency = domestic_currency
+        fx_ticker = _label(code + domestic_currency for code in asset_currencies)
+    else:
+        currency = asset_currency
+        fx_ticker = _label(code * 2 for code in asset_currencies)
+    return asset_currency, currency, fx_ticker
+
+
+def _PNL_columns(asset_currency: str, currency: str, fx_ticker: str) -> dict:
+    return {
+        config._AMOUNT: config._AMOUNT.capitalize(),
+        config._PRICE: f"{config._PRICE.capitalize()} ({asset_currency})",
+        config._FX_RATE: f"{config._FX_RATE.capitalize()} ({fx_ticker})",
+        config._ACQUISITION_PRICE: f"{config._ACQUISITION_PRICE.capitalize()} ({asset_currency})",
+        "P&L": f"P&L ({currency})",
+    }
+
+
 def calculate(args):
     global config
 
+    config._PRICES = args.prices
     config._DEDUCTIBLE = args.td
+    config._EXACT = args.exact
+    if args.stream:
+        _stream_PNL(args)
+        return
+
+    report = _calculate(load_input_files(args.FILES, config), args)
+    with _output(args.out, args.format) as f:
+        write_report(report, args.format, f)
+
+
+def _stream_PNL(args) -> None:
+    if (
+        args.mode != "profit-and-loss"
+        or args.format not in STREAM_FORMATS
+        or args.exact
+        or args.checkpoint
+    ):
+        print(
+            "ValueError: --stream writes only profit-and-loss in "
+            f"{' or '.join(STREAM_FORMATS)}, without --exact and --checkpoint"
+        )
+        raise SystemExit(1)
 
-    df = read_input_files(args.FILES, config)
+    # NOTE: Without a year every sell transaction is written, because the last
+    # year isn't known before the end of the stream.
+    if args.year is None or args.year == _ALL_YEARS:
+        years = None
+    else:
+        years = args.year if isinstance(args.year, list) else [args.year]
 
-    if args.year:
+    files, transactions = stream_input_files(args.FILES, config)
+    asset_currency, currency, fx_ticker = _currencies(
+        [input_file.asset_currency for input_file in files], args.ccy
+    )
+    columns = list(_PNL_columns(asset_currency, currency, fx_ticker).values())
+    records = iter_PNL(transactions, ccy=args.ccy, financial_years=years)
+    # NOTE: The asset is written only when there is more than one asset, like
+    # in the reports of `calculate`.
+    if len({input_file.asset for input_file in files}) > 1:
+        columns.insert(0, config._ASSET)
+    else:
+        records = (record[:1] + record[2:] for record in records)
+
+    with profiling.stage("P&L") as stage, _output(args.out, args.format) as f:
+        stage.rows += write_records(records, columns, args.format, f)
+
+
+def _ledger(df: DataFrame, ledgers: dict | None) -> Ledger:
+    # NOTE: The server keeps the ledgers of the input files in `ledgers`, so the
+    # average cost is calculated once per input files and arithmetic.
+    if ledgers is None:
+        return build_ledger(df, config)
+    if config._EXACT not in ledgers:
+        ledgers[config._EXACT] = build_ledger(df, config)
+    return ledgers[config._EXACT]
+
+
+def _calculate(dataset: Dataset, args, ledgers: dict | None = None) -> Report:
+    df = dataset.transactions
+    if args.checkpoint:
+        checkpoint = load_checkpoint(args.checkpoint)
+        ledger = build_ledger(df, config, checkpoint=checkpoint)
+        save_checkpoint(args.checkpoint, create_checkpoint(ledger, config))
+    else:
+        ledger = _ledger(df, ledgers)
+
+    if args.year == _ALL_YEARS:
+        year = list(range(df.index[0].year, df.index[-1].year + 1))
+    elif args.year:
         year = args.year
     else:
         year = df.index[-1].year
 
-    d = read_json_with_config(config)
-    asset_currency = d[config._ASSET_CURRENCY]
-    domestic_currency = config._DOMESTIC_CURRENCY
-    if not args.ccy:
-        currency = domestic_currency
-        fx_ticker = f"{asset_currency}{domestic_currency}"
-    else:
-        currency = asset_currency
-        fx_ticker = f"{asset_currency}{asset_currency}"
+    asset_currency, currency, fx_ticker = _currencies(
+        _asset_currencies(dataset), args.ccy
+    )
 
-    if args.mode == "summary":
-        df: DataFrame = calculate_statistics(
-            financial_year=year,
-            df=df,
+    if isinstance(year, list):
+        years = f"{year[0]}-{year[-1]}"
+        calculate_summary = calculate_statistics_for_years
+        calculate_profit_and_loss = calculate_PNL_for_years
+        calculate_tax_liability = calculate_skatteverket_for_years
+    else:
+        years = year
+        calculate_summary = calculate_statistics
+        calculate_profit_and_loss = calculate_PNL_per_year
+        calculate_tax_liability = calculate_skatteverket
+
+    if args.mode == "summary" and args.at:
+        dates = _snapshot_dates(args.at, year if isinstance(year, list) else [year])
+        df: DataFrame = calculate_statistics_at(
+            dates,
+            ledger=ledger,
             c=config,
             ccy=args.ccy,
         )
-        title = f"POSITION SUMMARY FOR {year}"
+        title = f"POSITION SUMMARY FROM {dates[0].date()} TO {dates[-1].date()}"
         column_map = {
             "Average buying price": f"Average buying price ({currency})",
         }
         index = False
-    elif args.mode == "profit-and-loss":
-        df: DataFrame = calculate_PNL_per_year(
-            financial_year=year,
-            df=df,
+    elif args.mode == "summary":
+        df: DataFrame = calculate_summary(
+            year,
+            ledger=ledger,
             c=config,
             ccy=args.ccy,
         )
-        title = f"PROFIT AND LOSS IN {year}"
+        title = f"POSITION SUMMARY FOR {years}"
         column_map = {
-            config._AMOUNT: config._AMOUNT.capitalize(),
-            config._PRICE: f"{config._PRICE.capitalize()} ({asset_currency})",
-            config._FX_RATE: f"{config._FX_RATE.capitalize()} ({fx_ticker})",
-            config._ACQUISITION_PRICE: f"{config._ACQUISITION_PRICE.capitalize()} ({asset_currency})",
-            "P&L": f"P&L ({currency})",
+            "Average buying price": f"Average buying price ({currency})",
         }
+        index = False
+    elif args.mode == "profit-and-loss":
+        df: DataFrame = calculate_profit_and_loss(
+            year,
+            ledger=ledger,
+            c=config,
+            ccy=args.ccy,
+        )
+        title = f"PROFIT AND LOSS IN {years}"
+        column_map = _PNL_columns(asset_currency, currency, fx_ticker)
         index = True
     elif args.mode == "tax-liability":
-        df: DataFrame = calculate_skatteverket(
-            financial_year=year,
-            df=df,
+        df: DataFrame = calculate_tax_liability(
+            year,
+            ledger=ledger,
             c=config,
             ccy=args.ccy,
         )
-        title = f"TAX LIABILITY FOR {year}"
+        title = f"TAX LIABILITY FOR {years}"
         column_map = {
             "Payed": f"Payed ({currency})",
             "Received": f"Received ({currency})",
@@ -166,17 +431,255 @@ def calculate(args):
         }
         index = False
 
-    print(format_DF(df, title=title, m=column_map, index=index))
+    return Report(df, title=title, m=column_map, index=index)
 
 
-if __name__ == "__main__":
-    config = Config()
+def _write_profile(profile: profiling.Profile, filename: str | None) -> None:
+    if filename:
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(profile.as_dict(), f, indent=4)
+    else:
+        print(profile.breakdown(), file=sys.stderr)
+
+
+def _batch_clients(source: str, out_dir: str | None = None) -> dict[str, list[str]]:
+    # NOTE: In a directory every input file is a client and so is every
+    # subdirectory with input files (except the caches of the input files and
+    # `out_dir`, whose index is a JSON file), a manifest is a JSON file that
+    # maps the clients to their input files (relative to the manifest).
+    source = Path(source)
+    out_dir = Path(out_dir).resolve() if out_dir is not None else None
+    clients = {}
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            if path.name.endswith(INPUT_CACHE_SUFFIX) or path.resolve() == out_dir:
+                continue
+            elif path.is_dir():
+                files = sorted(
+                    str(f.resolve()) for f in path.iterdir() if is_input_file(f)
+                )
+                if files:
+                    clients[path.name] = files
+            elif is_input_file(path):
+                clients[path.stem] = [str(path.resolve())]
+    else:
+        for client, files in read_json(source).items():
+            clients[client] = [str((source.parent / f).resolve()) for f in files]
+    return clients
+
+
+def _init_batch_worker(c: Config) -> None:
+    global config
+
+    config = c
+
+
+def _client_reports(dataset: Dataset, args) -> dict[str, Report]:
+    reports = {}
+    for report in args.reports:
+        if report == "forex-transactions":
+            report_args = argparse.Namespace(**vars(args), out=None, combined=False)
+            reports[report] = _forex_transactions(dataset, report_args)
+        else:
+            report_args = argparse.Namespace(
+                **vars(args), mode=report, checkpoint=None, at=None
+            )
+            reports[report] = _calculate(dataset, report_args)
+    return reports
+
+
+def _run_client(client: str, files: list[str], args) -> dict:
+    start = perf_counter()
+    rv = {"client": client, "files": files, "outputs": [], "error": None}
+
+    # NOTE: Errors in the input files print a message and exit, the message is
+    # kept as the error of the client instead.
+    messages = StringIO()
+    try:
+        with redirect_stdout(messages):
+            dataset = load_input_files(files, config)
+            reports = _client_reports(dataset, args)
+
+        # NOTE: The tables of a client are written to one file, the other
+        # formats have a file per report.
+        out_dir = Path(args.out_dir)
+        if args.format == TABLE:
+            output = out_dir / f"{client}.txt"
+            with open(output, "w", encoding="utf-8") as f:
+                for i, report in enumerate(reports.values()):
+                    if i:
+                        print(file=f)
+                    write_report(report, args.format, f)
+            rv["outputs"].append(str(output))
+        else:
+            for name, report in reports.items():
+                output = out_dir / f"{client}.{name}.{args.format}"
+                mode = "wb" if args.format == "parquet" else "w"
+                with open(output, mode) as f:
+                    write_report(report, args.format, f)
+                rv["outputs"].append(str(output))
+        rv["transactions"] = len(dataset.transactions)
+    except (Exception, SystemExit) as e:
+        rv["error"] = messages.getvalue().strip() or f"{type(e).__name__}: {e}"
+
+    rv["seconds"] = round(perf_counter() - start, 3)
+    return rv
+
+
+def batch(args):
+    global config
+
+    config._PRICES = args.prices
+    config._DEDUCTIBLE = args.td
+    config._EXACT = args.exact
+
+    # NOTE: The process pool (i.e., `multiprocessing`) is needed only here.
+    from concurrent.futures import ProcessPoolExecutor
+
+    clients = _batch_clients(args.SOURCE, args.out_dir)
+    Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+
+    start = perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_batch_worker,
+        initargs=(config,),
+    ) as executor:
+        futures = [
+            executor.submit(_run_client, client, files, args)
+            for client, files in clients.items()
+        ]
+        results = [future.result() for future in futures]
+    seconds = perf_counter() - start
+
+    failed = [result for result in results if result["error"]]
+    with open(Path(args.out_dir) / _BATCH_INDEX, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "clients": len(results),
+                "failed": len(failed),
+                "seconds": round(seconds, 3),
+                "results": results,
+            },
+            f,
+            ensure_ascii=False,
+            indent=4,
+        )
+
+    for result in failed:
+        print(f"{result['client']}: {result['error']}", file=sys.stderr)
+    print(
+        f"batch: {len(results)} clients in {seconds:.1f} s "
+        f"({len(results) / seconds:.1f} clients/s), {len(failed)} failed",
+        file=sys.stderr,
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+def _serve_request(
+    argv: list[str], parser: argparse.ArgumentParser, store: "LRUCache", c: Config
+) -> tuple[int, str, bytes]:
+    global config
+
+    from src.cit.server import file_key
+
+    # NOTE: Every request starts from the configuration of the server, and the
+    # messages of faulty requests (e.g., a missing input file) are the response.
+    messages = StringIO()
+    try:
+        with redirect_stdout(messages), redirect_stderr(messages):
+            args = parser.parse_args(argv)
+            if args.subcommand not in _SERVE_COMMANDS:
+                print(f"ValueError: The server runs only {', '.join(_SERVE_COMMANDS)}")
+                raise SystemExit(1)
+            # NOTE: The report is the response, the server doesn't write files
+            # (or stream to its own stdout) for a request.
+            if any(getattr(args, key, None) for key in ["stream", "out", "checkpoint"]):
+                print(
+                    "ValueError: The server doesn't take --stream, --out or --checkpoint"
+                )
+                raise SystemExit(1)
+
+            config = replace(c, _PRICES=args.prices)
+            if args.subcommand == "calculate":
+                config._DEDUCTIBLE = args.td
+                config._EXACT = args.exact
+
+            # NOTE: The input files are loaded again when any of them changes.
+            key = (
+                file_key([Path(config._DATA_PATH) / f for f in args.FILES]),
+                config._PRICES,
+            )
+            dataset, ledgers = store.get(
+                key, lambda: (load_input_files(args.FILES, config), {})
+            )
+            if args.subcommand == "transactions":
+                report = _list_transactions(dataset, args)
+            elif args.subcommand == "forex-transactions":
+                report = _forex_transactions(dataset, args, ledgers)
+            else:
+                report = _calculate(dataset, args, ledgers)
+    except (Exception, SystemExit) as e:
+        # NOTE: `--help` exits without an error.
+        status = 200 if isinstance(e, SystemExit) and not e.code else 400
+        message = messages.getvalue() or f"{type(e).__name__}: {e}\n"
+        return status, _CONTENT_TYPES[TABLE], message.encode("utf-8")
+
+    f = TextIOWrapper(BytesIO(), encoding="utf-8")
+    write_report(report, args.format, f)
+    f.flush()
+    return 200, _CONTENT_TYPES[args.format], f.buffer.getvalue()
+
+
+def serve(args):
+    # NOTE: The HTTP server (i.e., `http.server` and `socketserver`) is needed
+    # only here.
+    from src.cit.server import LRUCache, make_server
+
+    store = LRUCache(args.cache_size)
+    handler = partial(_serve_request, parser=parser, store=store, c=replace(config))
+    server = make_server(args.address, handler)
+    # NOTE: Stopping the server (e.g., by a service manager) closes it like ^C.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"serving on {args.address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(store.stats(), file=sys.stderr)
 
+
+def _parser(config: Config) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog=_PROGRAM_NAME,
         description=_DESCRIPTION,
     )
 
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="print the wall time and the rows of every stage of the run to stderr",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="like --timings and also trace the peak memory of every stage (slower)",
+    )
+    parser.add_argument(
+        "--profile-out",
+        default=None,
+        type=str,
+        help="write the timings (or the profile) to the specified JSON file instead of stderr",
+    )
+    parser.add_argument(
+        "--input-cache",
+        action="store_true",
+        help=f"cache the parsed JSON input files next to them (`<name>{INPUT_CACHE_SUFFIX}`) and memory-map them in later runs",
+    )
+
     subparsers = parser.add_subparsers(
         title="subcommands",
         dest="subcommand",
@@ -202,6 +705,12 @@ if __name__ == "__main__":
         help=f"specify the input files for reading (relative to {config._DATA_PATH} directory)",
         dest="FILES",
     )
+    list_parser.add_argument(
+        "--prices",
+        default=config._PRICES,
+        type=str,
+        help=f"fetch missing market data from Yahoo Finance (`{config._PRICES}`) or from price files in the specified directory",
+    )
     list_parser.add_argument(
         "--year",
         default=None,
@@ -214,6 +723,12 @@ if __name__ == "__main__":
         help="add a column with market prices in the domestic currency",
         dest="ccy",
     )
+    list_parser.add_argument(
+        "--format",
+        default=TABLE,
+        choices=FORMATS,
+        help=f"choose output format (default: {TABLE})",
+    )
     list_parser.set_defaults(func=list_transactions)
 
     forex_parser = subparsers.add_parser(
@@ -228,11 +743,43 @@ if __name__ == "__main__":
         help=f"specify the input files for reading (relative to {config._DATA_PATH} directory)",
         dest="FILES",
     )
+    forex_parser.add_argument(
+        "--prices",
+        default=config._PRICES,
+        type=str,
+        help=f"fetch missing market data from Yahoo Finance (`{config._PRICES}`) or from price files in the specified directory",
+    )
     forex_parser.add_argument(
         "--out",
         type=str,
         help=f"write the transactions data to the specified file",
     )
+    forex_parser.add_argument(
+        "--combined",
+        action="store_true",
+        help="calculate the tax liability of the assets and of their FX transactions together",
+    )
+    forex_years = forex_parser.add_mutually_exclusive_group()
+    forex_years.add_argument(
+        "--year",
+        default=None,
+        type=_financial_years,
+        help="show the --combined results for the specified year (or `all` years)",
+    )
+    forex_years.add_argument(
+        "--years",
+        default=None,
+        type=_financial_years,
+        help="show the --combined results per year for a range of years (e.g., 2018-2025 or `all`)",
+        metavar="YEARS",
+        dest="year",
+    )
+    forex_parser.add_argument(
+        "--format",
+        default=TABLE,
+        choices=FORMATS,
+        help=f"choose output format (default: {TABLE})",
+    )
     forex_parser.set_defaults(func=forex_transactions)
 
     calculate_parser = subparsers.add_parser(
@@ -253,10 +800,32 @@ if __name__ == "__main__":
         dest="FILES",
     )
     calculate_parser.add_argument(
+        "--prices",
+        default=config._PRICES,
+        type=str,
+        help=f"fetch missing market data from Yahoo Finance (`{config._PRICES}`) or from price files in the specified directory",
+    )
+    calculate_years = calculate_parser.add_mutually_exclusive_group()
+    calculate_years.add_argument(
         "--year",
         default=None,
-        type=int,
-        help="show the results for the specified year",
+        type=_financial_years,
+        help="show the results for the specified year (or `all` years)",
+    )
+    calculate_years.add_argument(
+        "--years",
+        default=None,
+        type=_financial_years,
+        help="show the results per year for a range of years (e.g., 2018-2025 or `all`)",
+        metavar="YEARS",
+        dest="year",
+    )
+    calculate_parser.add_argument(
+        "--at",
+        nargs="+",
+        default=None,
+        type=_snapshot_date,
+        help="show the summary at the end of the specified dates (e.g., 2022-06-30) or at the month-ends or quarter-ends of the years",
     )
     calculate_parser.add_argument(
         "--tax-deductible",
@@ -265,17 +834,163 @@ if __name__ == "__main__":
         help=f"set the tax-deductible percentage for the calculation (default: {config._DEDUCTIBLE})",
         dest="td",
     )
+    calculate_parser.add_argument(
+        "--checkpoint",
+        default=None,
+        type=str,
+        help="resume the average cost calculation from the specified checkpoint file and update it afterwards",
+    )
+    calculate_parser.add_argument(
+        "--exact",
+        action="store_true",
+        help="calculate in fixed-point arithmetic with defined rounding",
+    )
+    calculate_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="write the profit-and-loss of every sell transaction while reading the input files (csv or jsonl)",
+    )
+    calculate_parser.add_argument(
+        "--out",
+        default=None,
+        type=str,
+        help="write the report to the specified file instead of stdout",
+    )
     calculate_parser.add_argument(
         "--domestic-ccy",
         action="store_false",
         help="convert to domestic currency",
         dest="ccy",
     )
+    calculate_parser.add_argument(
+        "--format",
+        default=TABLE,
+        choices=FORMATS,
+        help=f"choose output format (default: {TABLE})",
+    )
     calculate_parser.set_defaults(func=calculate)
 
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="run reports for every client in a directory or manifest of input files",
+    )
+    batch_parser.add_argument(
+        "SOURCE",
+        type=str,
+        help="directory with an input file or a subdirectory of input files per client, or a JSON manifest that maps clients to their input files",
+    )
+    batch_parser.add_argument(
+        "--reports",
+        nargs="+",
+        default=_BATCH_REPORTS,
+        choices=_BATCH_REPORTS,
+        help="choose report types (default: all)",
+    )
+    batch_parser.add_argument(
+        "--out",
+        default="./output",
+        type=str,
+        help=f"write a report file per client and {_BATCH_INDEX} to the specified directory (default: ./output)",
+        dest="out_dir",
+    )
+    batch_parser.add_argument(
+        "--workers",
+        default=None,
+        type=int,
+        help="set the number of worker processes (default: number of processors)",
+    )
+    batch_parser.add_argument(
+        "--prices",
+        default=config._PRICES,
+        type=str,
+        help=f"fetch missing market data from Yahoo Finance (`{config._PRICES}`) or from price files in the specified directory",
+    )
+    batch_years = batch_parser.add_mutually_exclusive_group()
+    batch_years.add_argument(
+        "--year",
+        default=None,
+        type=_financial_years,
+        help="show the results for the specified year (or `all` years)",
+    )
+    batch_years.add_argument(
+        "--years",
+        default=None,
+        type=_financial_years,
+        help="show the results per year for a range of years (e.g., 2018-2025 or `all`)",
+        metavar="YEARS",
+        dest="year",
+    )
+    batch_parser.add_argument(
+        "--tax-deductible",
+        default=config._DEDUCTIBLE,
+        type=float,
+        help=f"set the tax-deductible percentage for the calculation (default: {config._DEDUCTIBLE})",
+        dest="td",
+    )
+    batch_parser.add_argument(
+        "--exact",
+        action="store_true",
+        help="calculate in fixed-point arithmetic with defined rounding",
+    )
+    batch_parser.add_argument(
+        "--domestic-ccy",
+        action="store_false",
+        help="convert to domestic currency",
+        dest="ccy",
+    )
+    batch_parser.add_argument(
+        "--format",
+        default=TABLE,
+        choices=FORMATS,
+        help=f"choose output format (default: {TABLE})",
+    )
+    batch_parser.set_defaults(func=batch)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="answer transactions, forex-transactions and calculate requests over HTTP",
+    )
+    serve_parser.add_argument(
+        "--address",
+        default="127.0.0.1:8080",
+        type=str,
+        help="listen on the specified host:port or Unix socket path (default: 127.0.0.1:8080)",
+    )
+    serve_parser.add_argument(
+        "--cache-size",
+        default=32,
+        type=int,
+        help="keep the loaded input files and ledgers of the specified number of requests in memory (default: 32)",
+    )
+    serve_parser.set_defaults(func=serve)
+
+    return parser
+
+
+if __name__ == "__main__":
+    config = Config()
+
+    parser = _parser(config)
+
     args = parser.parse_args()
 
     if args.subcommand:
-        args.func(args)
+        config._INPUT_CACHE = args.input_cache
+        if args.timings or args.profile or args.profile_out:
+            profiling.enable(memory=args.profile)
+        try:
+            args.func(args)
+        except BrokenPipeError:
+            # NOTE: The output is piped to a program that stopped reading it
+            # (e.g., `head`), the rest of the output is discarded.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            raise SystemExit(1)
+        finally:
+            # NOTE: The profile of a run that stopped early is written, too.
+            profile = profiling.disable()
+            if profile is not None:
+                _write_profile(profile, args.profile_out)
+        for market_data_cache in opened_market_data_caches():
+            print(market_data_cache.stats(), file=sys.stderr)
     else:
         parser.print_help()
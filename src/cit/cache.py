@@ -0,0 +1,224 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+import json
+import os
+from pathlib import Path
+import shutil
+import sqlite3
+import tempfile
+from threading import Lock
+from typing import Callable, Iterator
+
+import numpy as np
+from pandas import DataFrame, DatetimeIndex, date_range
+
+Fetch = Callable[[str, date, date], DataFrame]
+
+INPUT_CACHE_SUFFIX = ".cit-cache"
+
+_INPUT_CACHE_VERSION = 1
+
+_INPUT_CACHE_META = "meta.json"
+
+
+class MarketDataCache:
+    """Persistent store of daily market data keyed by ticker and date.
+
+    Every day that has been fetched is stored, including weekends and holidays
+    without any market data, so that a day is never requested twice. Days from
+    today onward are never stored because their market data is not final yet.
+    """
+
+    _FILENAME = "market-data.sqlite"
+
+    def __init__(self, path: str) -> None:
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.filename = directory / self._FILENAME
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                "ticker TEXT NOT NULL, "
+                "date TEXT NOT NULL, "
+                "open REAL, "
+                "close REAL, "
+                "PRIMARY KEY (ticker, date)"
+                ") WITHOUT ROWID"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.filename)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _cached_days(self, ticker: str, start: date, end: date) -> set[str]:
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT date FROM prices WHERE ticker = ? AND date >= ? AND date < ?",
+                (ticker, start.isoformat(), end.isoformat()),
+            )
+            return {day for (day,) in rows}
+
+    def _store(self, ticker: str, days: DatetimeIndex, df: DataFrame) -> None:
+        df = df.reindex(days)
+        rows = [
+            (ticker, day.date().isoformat(), _nullable(o), _nullable(c))
+            for day, o, c in zip(df.index, df.Open, df.Close)
+            if day.date() < date.today()
+        ]
+        with self._lock, self._connect() as con:
+            con.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?)", rows)
+
+    def read(self, ticker: str, start: date, end: date, fetch: Fetch) -> DataFrame:
+        """Returns `Open` and `Close` prices for the trading days in [`start`, `end`).
+
+        Only the ranges of days that are missing from the cache are fetched.
+        """
+        days = date_range(start, end - timedelta(days=1), freq="D")
+        cached = self._cached_days(ticker, start, end)
+        missing = days[~days.strftime("%Y-%m-%d").isin(cached)]
+
+        with self._lock:
+            self.hits += len(days) - len(missing)
+            self.misses += len(missing)
+
+        for missing_days in _consecutive(missing):
+            df = fetch(
+                ticker,
+                missing_days[0].date(),
+                missing_days[-1].date() + timedelta(days=1),
+            )
+            # NOTE: An empty result means that the download failed, storing it
+            # would hide the market data for these days forever.
+            if not df.empty:
+                self._store(ticker, missing_days, df.loc[:, ["Open", "Close"]])
+
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT date, open, close FROM prices "
+                "WHERE ticker = ? AND date >= ? AND date < ? AND open IS NOT NULL "
+                "ORDER BY date",
+                (ticker, start.isoformat(), end.isoformat()),
+            ).fetchall()
+
+        df = DataFrame(rows, columns=["Date", "Open", "Close"])
+        return df.astype(
+            {"Date": "datetime64[ns]", "Open": "float64", "Close": "float64"}
+        ).set_index("Date")
+
+    def stats(self) -> str:
+        return f"market data cache: {self.hits} hits, {self.misses} misses (days)"
+
+
+def _nullable(value: float) -> float | None:
+    return None if value != value else float(value)
+
+
+def _consecutive(days: DatetimeIndex) -> list[DatetimeIndex]:
+    if days.empty:
+        return []
+    breaks = (days[1:] - days[:-1]) != timedelta(days=1)
+    starts = [0, *(i + 1 for i, is_break in enumerate(breaks) if is_break), len(days)]
+    return [days[i:j] for i, j in zip(starts[:-1], starts[1:])]
+
+
+_caches: dict[str, MarketDataCache] = {}
+
+
+def open_market_data_cache(path: str) -> MarketDataCache:
+    if path not in _caches:
+        _caches[path] = MarketDataCache(path)
+    return _caches[path]
+
+
+def opened_market_data_caches() -> list[MarketDataCache]:
+    return list(_caches.values())
+
+
+def _input_cache_dirs(filename: Path, stat: os.stat_result) -> tuple[Path, Path]:
+    # NOTE: The cache of an input file is in a directory next to it, with a
+    # subdirectory per size and modification time of the input file.
+    root = filename.with_name(filename.name + INPUT_CACHE_SUFFIX)
+    return root, root / f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def load_input_cache(
+    filename: Path, stat: os.stat_result, names: list[str]
+) -> tuple[dict, dict[str, np.ndarray], str] | None:
+    """Returns the cached top-level values, columns and data type of an input file.
+
+    The columns are memory-mapped from their `.npy` files, so the pages are read
+    only when they're used and are shared by the processes that read the same
+    cache. Returns `None` when the input file (with `stat`) changed since it
+    was cached or when it was cached with other column `names`.
+    """
+    try:
+        _, directory = _input_cache_dirs(filename, stat)
+        with open(directory / _INPUT_CACHE_META, "r") as fhandle:
+            meta = json.load(fhandle)
+    except (OSError, ValueError):
+        return None
+    is_stale = meta["version"] != _INPUT_CACHE_VERSION
+    if is_stale or not set(meta["columns"]).issubset(names):
+        return None
+
+    columns = {
+        name: np.load(directory / f"{i}.npy", mmap_mode="r")
+        for i, name in enumerate(meta["columns"])
+    }
+    return meta["header"], columns, meta["data_type"]
+
+
+def save_input_cache(
+    filename: Path,
+    stat: os.stat_result,
+    header: dict,
+    columns: dict[str, np.ndarray],
+    data_type: str,
+) -> None:
+    """Writes the columns of an input file to its cache for `load_input_cache`.
+
+    The cache is written to a temporary directory that is renamed when it is
+    complete, therefore, concurrent runs never read a partial cache. The caches
+    of earlier versions of the input file are removed.
+    """
+    # NOTE: The cache only saves time, an input file in a read-only directory
+    # is read without it.
+    try:
+        root, directory = _input_cache_dirs(filename, stat)
+        root.mkdir(exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=root))
+        # NOTE: Other users can read the cache like the input file.
+        tmp.chmod(root.stat().st_mode & 0o777)
+    except OSError:
+        return
+
+    try:
+        for i, values in enumerate(columns.values()):
+            np.save(tmp / f"{i}.npy", np.ascontiguousarray(values))
+        with open(tmp / _INPUT_CACHE_META, "w") as fhandle:
+            json.dump(
+                {
+                    "version": _INPUT_CACHE_VERSION,
+                    "columns": list(columns),
+                    "header": header,
+                    "data_type": data_type,
+                },
+                fhandle,
+            )
+        os.rename(tmp, directory)
+    except OSError:
+        # NOTE: Another run cached the same input file at the same time.
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+
+    for path in root.iterdir():
+        if path != directory and not path.name.startswith(".tmp-"):
+            shutil.rmtree(path, ignore_errors=True)
@@ -1,218 +1,778 @@
+from dataclasses import dataclass
+import hashlib
 from numbers import Integral as N
 from numbers import Real as R
+from typing import Iterable, Iterator
 
 import numpy as np
-from pandas import concat, DataFrame, Series
-
+from pandas import (
+    concat,
+    DataFrame,
+    DatetimeIndex,
+    Index,
+    MultiIndex,
+    NaT,
+    Series,
+    Timestamp,
+)
+from pandas.util import hash_pandas_object
+
+from src.cit import exact, profiling
 from src.cit.config import Config
 
 
-def calculate_acquisition_prices(df: DataFrame, c: Config) -> DataFrame:
-    _COST = "_cost_per_unit"
+def _average_cost(
+    amounts: np.ndarray,
+    prices: np.ndarray,
+    held: R = 0.0,
+    acquisition_price: R | None = None,
+) -> np.ndarray:
+    """Returns the acquisition price after each transaction (genomsnittsmetoden).
+
+    The average cost is a running fold over (held amount, acquisition price):
+    buying moves the acquisition price towards the market price weighted by the
+    bought amount, selling only reduces the held amount. The fold runs once over
+    plain floats taken from the NumPy columns instead of per-row pandas objects.
+    It starts from the state after earlier transactions when `acquisition_price`
+    is given, and from the first transaction otherwise.
+    """
+    acquisition_prices: list[R] = []
+
+    is_first = acquisition_price is None
+    for amount, price in zip(amounts.tolist(), prices.tolist()):
+        cost = price if amount > 0 else -price if amount < 0 else 0.0
+        if is_first:
+            acquisition_price, is_first = cost, False
+        # When selling `acquisition_price` doesn't change but the amount held
+        # changes, when buying both are affected:
+        elif cost >= 0 and held + amount == 0:
+            # NOTE: Nothing is held after the transaction (e.g., a buy closing
+            # a short position), so there's nothing to average and a buy starts
+            # over from its own price.
+            if amount > 0:
+                acquisition_price = cost
+        elif cost >= 0:
+            acquisition_price = (acquisition_price * held + cost * amount) / (
+                held + amount
+            )
+        held += amount
+        acquisition_prices.append(acquisition_price)
+
+    return np.array(acquisition_prices, dtype=np.float64)
+
+
+def _average_cost_exact(
+    amounts: np.ndarray,
+    prices: np.ndarray,
+    held: N = 0,
+    acquisition_price: N | None = None,
+) -> np.ndarray:
+    """Returns the acquisition price after each transaction in micro-units.
+
+    The same fold as `_average_cost` over integer amounts and prices in
+    micro-units, the acquisition price is rounded after every buy.
+    """
+    acquisition_prices: list[N] = []
+
+    is_first = acquisition_price is None
+    for amount, price in zip(amounts.tolist(), prices.tolist()):
+        cost = price if amount > 0 else -price if amount < 0 else 0
+        if is_first:
+            acquisition_price, is_first = cost, False
+        elif cost >= 0 and held + amount == 0:
+            if amount > 0:
+                acquisition_price = cost
+        elif cost >= 0:
+            acquisition_price = exact.div_round_int(
+                acquisition_price * held + cost * amount, held + amount
+            )
+        held += amount
+        acquisition_prices.append(acquisition_price)
 
-    def _calculate_cost(df: DataFrame, c: Config) -> DataFrame:
-        nonlocal _COST
-        df = (
-            df.copy()
-            .assign(Cost=lambda x: (-1 * np.sign(x[c._AMOUNT])) * x[c._PRICE])
-            .rename(columns={"Cost": _COST})
-        )
-        return df
+    return np.array(acquisition_prices, dtype=np.int64)
+
+
+def _assets(df: DataFrame, c: Config) -> Series:
+    # NOTE: Transactions without `c._ASSET` (e.g., framed from a single input
+    # file) belong to one unnamed asset.
+    if c._ASSET in df:
+        return df[c._ASSET]
+    else:
+        return Series("", index=df.index, name=c._ASSET)
 
-    def _calculate_acquisition_prices(df: DataFrame, c: Config) -> list[R]:
-        nonlocal _COST
 
-        def _is_sell(cost: R) -> bool:
-            return True if cost < 0 else False
+@dataclass
+class Checkpoint:
+    """Average cost state after the first `rows` transactions of a history.
 
-        def _is_first_transaction(row: Series, df: DataFrame) -> bool:
-            first_row = 0
-            return row.equals(df.iloc[first_row, :])
+    `digest` identifies these transactions, `acquisition_prices` holds the
+    acquisition price after each of them and `state` the held amount and the
+    acquisition price of every asset after the last of them (`date`).
+    """
 
-        df_transactions = df.pipe(_calculate_cost, c=c)
+    rows: int
+    date: Timestamp
+    digest: str
+    acquisition_prices: np.ndarray
+    state: dict[str, tuple[R, R]]
 
-        acquisition_prices: list[R] = []
-        for _, transaction in df_transactions.iterrows():
-            cost, amount = -transaction[_COST], transaction[c._AMOUNT]
 
-            if _is_first_transaction(transaction, df_transactions):
-                acquisition_price = cost
-                acquisition_amount = 0 + amount
-            else:
-                acquisition_amount = (
-                    previous_acquisition_amount := acquisition_amount
-                ) + amount
-                # When selling `acquisition_price` doesn't change but the amount
-                # held (i.e., `acquisition_amount`) changes:
-                if _is_sell(cost):
-                    acquisition_price: R = acquisition_price
-                # When buying both `acquisition_price` and `acquisition_amount` are affected:
-                else:
-                    acquisition_price: R = np.average(
-                        [acquisition_price, cost],
-                        weights=[previous_acquisition_amount, amount],
-                    )
-
-            acquisition_prices.append(acquisition_price)
-
-        return acquisition_prices
-
-    acquisition_prices: list[R] = df.pipe(_calculate_acquisition_prices, c=c)
-    return concat(
-        [df, Series(acquisition_prices, index=df.index, name=c._ACQUISITION_PRICE)],
-        axis=1,
+def _digest(df: DataFrame, c: Config) -> str:
+    columns = df.loc[:, [c._AMOUNT, c._PRICE]].assign(**{c._ASSET: _assets(df, c)})
+    digest = hashlib.sha256(
+        hash_pandas_object(columns, index=True).to_numpy().tobytes()
     )
+    # NOTE: The acquisition prices depend on the arithmetic, a checkpoint of
+    # the floating-point arithmetic isn't resumed in the exact arithmetic and
+    # vice versa.
+    if c._EXACT:
+        digest.update(b"exact")
+    return digest.hexdigest()
+
+
+def _resume(df: DataFrame, checkpoint: Checkpoint | None, c: Config) -> Checkpoint:
+    # NOTE: The checkpoint holds only when the transactions before it haven't
+    # changed, otherwise the average cost is recalculated from the beginning.
+    if (
+        checkpoint is not None
+        and checkpoint.rows <= len(df)
+        and _digest(df.iloc[: checkpoint.rows], c) == checkpoint.digest
+    ):
+        return checkpoint
+    else:
+        return Checkpoint(
+            rows=0,
+            date=NaT,
+            digest=_digest(df.iloc[:0], c),
+            acquisition_prices=np.empty(0, dtype=np.float64),
+            state={},
+        )
 
 
-def calculate_statistics(
-    financial_year: int,
-    df: DataFrame,
-    c: Config,
-    ccy: bool,
+def _with_columns(df: DataFrame, columns: dict[str, np.ndarray]) -> DataFrame:
+    # NOTE: Unlike `DataFrame.assign` the new frame shares the columns of `df`
+    # instead of copying all of them.
+    return DataFrame(
+        {**{key: df[key].array for key in df.columns}, **columns},
+        index=df.index,
+        copy=False,
+    )
+
+
+def _acquisition_prices(
+    df: DataFrame, c: Config, checkpoint: Checkpoint | None
+) -> np.ndarray:
+    with profiling.stage("acquisition prices") as stage:
+        checkpoint = _resume(df, checkpoint, c)
+        new = df.iloc[checkpoint.rows :]
+
+        amounts = new[c._AMOUNT].to_numpy(dtype=np.float64)
+        prices = new[c._PRICE].to_numpy(dtype=np.float64)
+        state = checkpoint.state
+        average_cost = _average_cost
+        if c._EXACT:
+            amounts = exact.to_units(amounts, exact.AMOUNT_SCALE, c._AMOUNT)
+            prices = exact.to_units(prices, exact.PRICE_SCALE, c._PRICE)
+            state = {
+                asset: (
+                    round(held * exact.AMOUNT_SCALE),
+                    round(acquisition_price * exact.PRICE_SCALE),
+                )
+                for asset, (held, acquisition_price) in state.items()
+            }
+            average_cost = _average_cost_exact
+
+        # NOTE: Every asset has its own average cost, therefore, the fold runs
+        # over the transactions of one asset at a time.
+        acquisition_prices = np.empty(len(new), dtype=amounts.dtype)
+        assets = _assets(new, c)
+        for asset, positions in assets.groupby(
+            assets, sort=False, observed=True
+        ).indices.items():
+            acquisition_prices[positions] = average_cost(
+                amounts[positions], prices[positions], *state.get(asset, ())
+            )
+        stage.rows += len(new)
+
+        if c._EXACT:
+            acquisition_prices = exact.from_units(acquisition_prices, exact.PRICE_SCALE)
+
+        return np.concatenate([checkpoint.acquisition_prices, acquisition_prices])
+
+
+def calculate_acquisition_prices(
+    df: DataFrame, c: Config, checkpoint: Checkpoint | None = None
 ) -> DataFrame:
-    df_transactions = df.loc[df.index.year <= financial_year]
+    return _with_columns(
+        df, {c._ACQUISITION_PRICE: _acquisition_prices(df, c, checkpoint)}
+    )
 
-    amount_bought: R = df_transactions.loc[
-        df_transactions[c._AMOUNT] > 0, c._AMOUNT
-    ].sum()
-    amount_sold: R = df_transactions.loc[
-        df_transactions[c._AMOUNT] < 0, c._AMOUNT
-    ].sum()
-    amount_remaining: R = amount_bought + amount_sold
 
-    df_ = calculate_acquisition_prices(df, c=c)
-    df_ = df_.loc[df_.index.year <= financial_year]
+@dataclass
+class Ledger:
+    """Transaction history together with its average cost state.
 
-    if df_.empty:
-        avg_buying_price = 0.0
-    else:
-        acquisition_price = df_[c._ACQUISITION_PRICE].tail(1).squeeze()
-        fx_rate = df_[c._FX_RATE].tail(1).squeeze()
-        if ccy:
-            avg_buying_price: R = acquisition_price
-        else:
-            avg_buying_price: R = acquisition_price * fx_rate
+    Next to the input columns `transactions` holds the amount held
+    (`c._HELD_AMOUNT`) and the acquisition price (`c._ACQUISITION_PRICE`)
+    after each transaction, and the profit and loss of each sell transaction
+    in the asset-denominated (`c._PNL`) and the domestic currency
+    (`c._DOMESTIC_PNL`). The reports read from the ledger, so the average cost
+    is calculated only once per transaction history.
+
+    When the transaction history holds more than one of the `assets`, every
+    report has a row per asset.
+
+    The transactions of year `years[i]` are the rows from `year_offsets[i]` up
+    to `year_offsets[i + 1]`, and `buys` and `sells` are the (sorted) positions
+    of the buy and of the sell transactions, so the transactions of a year or
+    of a side are found by a binary search instead of a mask over every row.
+
+    `snapshots` holds the position of every asset at the end of every one of
+    `years` (see `_snapshots`), so a summary is a lookup.
+    """
+
+    transactions: DataFrame
+    assets: list[str]
+    years: range
+    year_offsets: np.ndarray
+    buys: np.ndarray
+    sells: np.ndarray
+    snapshots: DataFrame
+
+
+def _year_offsets(index: DatetimeIndex) -> tuple[range, np.ndarray]:
+    # NOTE: The transactions are sorted by date, therefore, the first
+    # transaction of every year is found by `searchsorted`.
+    if len(index) == 0:
+        return range(0), np.zeros(1, dtype=np.int64)
+    years = range(index[0].year, index[-1].year + 1)
+    starts = index.searchsorted(DatetimeIndex([Timestamp(y, 1, 1) for y in years[1:]]))
+    return years, np.concatenate([[0], starts, [len(index)]]).astype(np.int64)
+
+
+def _year_bounds(ledger: Ledger, financial_year: N) -> tuple[int, int]:
+    i = financial_year - ledger.years.start
+    n = len(ledger.years)
+    return (
+        int(ledger.year_offsets[min(max(i, 0), n)]),
+        int(ledger.year_offsets[min(max(i + 1, 0), n)]),
+    )
+
+
+def _year_rows(
+    ledger: Ledger, financial_years: list[N], positions: np.ndarray
+) -> np.ndarray:
+    """Returns the `positions` (e.g., `ledger.sells`) in `financial_years`.
+
+    The positions of a single year are a view of `positions`.
+    """
+    rows = [
+        positions[np.searchsorted(positions, start) : np.searchsorted(positions, stop)]
+        for start, stop in (_year_bounds(ledger, year) for year in financial_years)
+    ]
+    if len(rows) == 1:
+        return rows[0]
+    return np.concatenate([np.empty(0, dtype=np.int64), *rows])
+
+
+def _year_labels(ledger: Ledger, rows: slice) -> np.ndarray:
+    # NOTE: The year of every transaction is repeated from the year offsets
+    # (instead of taking it from every date of the index).
+    years = np.arange(ledger.years.start, ledger.years.stop, dtype=np.int16)
+    return np.repeat(years, np.diff(ledger.year_offsets))[rows]
+
+
+def _years_of(ledger: Ledger, positions: np.ndarray) -> np.ndarray:
+    return (
+        ledger.years.start
+        + np.searchsorted(ledger.year_offsets, positions, side="right")
+        - 1
+    )
+
+
+def _at(values: np.ndarray, positions: np.ndarray, fill: R) -> np.ndarray:
+    # NOTE: A negative position (i.e., before the first value) is `fill`.
+    rv = np.full(len(positions), fill, dtype=np.float64)
+    rv[positions >= 0] = values[positions[positions >= 0]]
+    return rv
+
+
+def _snapshots(
+    df: DataFrame, c: Config, assets: list[str], stops: np.ndarray, labels: Index
+) -> DataFrame:
+    """Returns the position of every asset after the first `stops` transactions.
+
+    The position is the number of transactions and the amount bought and sold
+    since the first transaction, the remaining amount, and the last acquisition
+    price and exchange rate of the asset (i.e., before its first transaction the
+    amounts are 0 and the prices are missing). The positions are labeled by the
+    asset and by `labels`.
+    """
+    amount, scale = _amounts(df, c)
+    amount = amount.to_numpy()
+    bought = np.where(amount > 0, amount, 0)
+    sold = np.where(amount < 0, amount, 0)
+    asset_rows = _assets(df, c).groupby(_assets(df, c), observed=True).indices
+
+    columns: dict[str, list[np.ndarray]] = {
+        "Transactions": [],
+        "Amount bought": [],
+        "Amount sold": [],
+        c._ACQUISITION_PRICE: [],
+        c._FX_RATE: [],
+    }
+    for asset in assets:
+        rows = asset_rows.get(asset, np.empty(0, dtype=np.int64))
+        # NOTE: The position at a stop is the one after the last transaction of
+        # the asset before the stop.
+        last = np.searchsorted(rows, stops) - 1
+        columns["Transactions"].append(last + 1.0)
+        columns["Amount bought"].append(_at(np.cumsum(bought[rows]), last, 0.0))
+        columns["Amount sold"].append(_at(np.cumsum(sold[rows]), last, 0.0))
+        for key in [c._ACQUISITION_PRICE, c._FX_RATE]:
+            columns[key].append(_at(df[key].to_numpy()[rows], last, np.nan))
 
     df = DataFrame(
         {
-            "Amount bought": [amount_bought],
-            "Amount sold": [amount_sold],
-            "Remaining": [amount_remaining],
-            "Average buying price": [avg_buying_price],
-        }
-    ).round(
-        {
-            "Amount bought": 6,
-            "Amount sold": 6,
-            "Remaining": 6,
-            "Average buying price": 2,
-        }
+            key: np.concatenate([np.empty(0), *values])
+            for key, values in columns.items()
+        },
+        index=MultiIndex.from_product([assets, labels], names=[c._ASSET, labels.name]),
     )
+    df.insert(3, "Remaining", df["Amount bought"] + df["Amount sold"])
+    df[["Amount bought", "Amount sold", "Remaining"]] /= scale
     return df
 
 
-def _calculate_PNL(df: DataFrame, c: Config, ccy: bool) -> DataFrame:
+def _exact_units(
+    df: DataFrame, c: Config, acquisition_prices: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    if acquisition_prices is None:
+        acquisition_prices = df[c._ACQUISITION_PRICE].to_numpy()
+    return (
+        exact.to_units(df[c._AMOUNT].to_numpy(), exact.AMOUNT_SCALE, c._AMOUNT),
+        exact.to_units(df[c._PRICE].to_numpy(), exact.PRICE_SCALE, c._PRICE),
+        exact.to_units(acquisition_prices, exact.PRICE_SCALE, c._ACQUISITION_PRICE),
+        exact.to_units(df[c._FX_RATE].to_numpy(), exact.MONEY_SCALE, c._FX_RATE),
+    )
+
+
+def _exact_ledger_columns(
+    df: DataFrame, acquisition_prices: np.ndarray, assets: Series, c: Config
+) -> dict[str, np.ndarray]:
+    amounts, prices, acquisition_prices, fx_rates = _exact_units(
+        df, c, acquisition_prices
+    )
+    is_sell = amounts < 0
+    held = Series(amounts, index=df.index).groupby(assets, sort=False, observed=True)
+    sells = amounts[is_sell], prices[is_sell], acquisition_prices[is_sell]
+
+    # NOTE: The profit and loss in the asset-denominated currency is converted
+    # at the exchange rate 1 (i.e., 100 hundredths).
+    columns = {
+        c._HELD_AMOUNT: exact.from_units(held.cumsum().to_numpy(), exact.AMOUNT_SCALE)
+    }
+    for pnl, rates in [
+        (c._PNL, np.full(len(sells[0]), exact.MONEY_SCALE)),
+        (c._DOMESTIC_PNL, fx_rates[is_sell]),
+    ]:
+        proceeds, cost = exact.sales(*sells, rates)
+        columns[pnl] = np.full(len(df), np.nan)
+        columns[pnl][is_sell] = exact.from_units(proceeds - cost, exact.MONEY_SCALE)
+    return columns
+
+
+def build_ledger(
+    df: DataFrame, c: Config, checkpoint: Checkpoint | None = None
+) -> Ledger:
+    """Returns the ledger of the transaction history `df`.
+
+    With the `checkpoint` of an earlier ledger of the same history, only the
+    transactions after the checkpoint go through the average cost fold.
+    """
+    acquisition_prices = _acquisition_prices(df, c, checkpoint)
+    assets = _assets(df, c)
+
     # NOTE: Profit and loss (PNL) can be calculated only for sell transactions
     # (i.e., when `c._AMOUNT` is negative), because buy transactions do not
     # have any profit and loss.
-
-    # NOTE: This is an overloading trick, `_calculate_PNL` calculates `c._PNL`
-    # denominated in same currency as the asset (i.e., `c._PRICE`) and
-    # `c._FX_RATE` transforms `c._PNL` and `c._PRICE` to the domestic currency.
-    # Setting the foreign exchange rates to 1 ensures that `c._PNL` and
-    # `c._PRICE` stay in the asset-denominated currency.
-    if not ccy:
-        pass
-    else:
-        df[c._FX_RATE] = 1
-
-    df = (
-        df.copy()
-        .query(f"{c._AMOUNT} < 0")
-        .assign(
-            PNL=lambda x: (-1 * x[c._AMOUNT])
-            * x[c._FX_RATE]
-            * (x[c._PRICE] - x[c._ACQUISITION_PRICE])
+    with profiling.stage("P&L") as stage:
+        if c._EXACT:
+            columns = _exact_ledger_columns(df, acquisition_prices, assets, c)
+        else:
+            amounts = df[c._AMOUNT].to_numpy(dtype=np.float64)
+            prices = df[c._PRICE].to_numpy(dtype=np.float64)
+            fx_rates = df[c._FX_RATE].to_numpy(dtype=np.float64)
+            is_sell = amounts < 0
+            columns = {
+                c._HELD_AMOUNT: df[c._AMOUNT]
+                .groupby(assets, sort=False, observed=True)
+                .cumsum()
+                .to_numpy(),
+                c._PNL: np.where(
+                    is_sell, (-1 * amounts) * (prices - acquisition_prices), np.nan
+                ),
+                c._DOMESTIC_PNL: np.where(
+                    is_sell,
+                    (-1 * amounts) * fx_rates * (prices - acquisition_prices),
+                    np.nan,
+                ),
+            }
+        df = _with_columns(df, {c._ACQUISITION_PRICE: acquisition_prices, **columns})
+        stage.rows += len(df)
+
+    amounts = df[c._AMOUNT].to_numpy()
+    assets = sorted(assets.unique())
+    years, year_offsets = _year_offsets(df.index)
+    with profiling.stage("aggregation"):
+        snapshots = _snapshots(
+            df, c, assets, year_offsets[1:], Index(years, name="Year")
         )
-        .rename(columns={"PNL": c._PNL})
+    return Ledger(
+        transactions=df,
+        assets=assets,
+        years=years,
+        year_offsets=year_offsets,
+        buys=np.flatnonzero(amounts > 0),
+        sells=np.flatnonzero(amounts < 0),
+        snapshots=snapshots,
     )
-    return df
 
 
-def calculate_PNL(df: DataFrame, c: Config, ccy: bool) -> DataFrame:
-    df = (
-        df.copy()
-        .pipe(calculate_acquisition_prices, c=c)
-        .pipe(_calculate_PNL, c=c, ccy=ccy)
+def create_checkpoint(ledger: Ledger, c: Config) -> Checkpoint:
+    df = ledger.transactions
+    last = df.groupby(_assets(df, c), sort=False, observed=True).last()
+    return Checkpoint(
+        rows=len(df),
+        date=df.index[-1] if len(df) else NaT,
+        digest=_digest(df, c),
+        acquisition_prices=df[c._ACQUISITION_PRICE].to_numpy(dtype=np.float64),
+        state={
+            asset: (held, acquisition_price)
+            for asset, held, acquisition_price in zip(
+                last.index, last[c._HELD_AMOUNT], last[c._ACQUISITION_PRICE]
+            )
+        },
     )
+
+
+def _amounts(df: DataFrame, c: Config) -> tuple[Series, N]:
+    # NOTE: In the exact mode the amounts are summed in micro-units, which are
+    # integers held exactly by float64, and divided by the returned scale.
+    if c._EXACT:
+        return (df[c._AMOUNT] * exact.AMOUNT_SCALE).round(), exact.AMOUNT_SCALE
+    else:
+        return df[c._AMOUNT], 1
+
+
+def _per_asset(df: DataFrame, ledger: Ledger, c: Config) -> DataFrame:
+    # NOTE: Reports of a single asset are shown without the `c._ASSET` column.
+    # Every report is a new frame, so the column is removed without a copy.
+    if len(ledger.assets) <= 1:
+        del df[c._ASSET]
     return df
 
 
-def calculate_PNL_per_year(
-    financial_year: N, df: DataFrame, c: Config, ccy: bool
+def _summary(df: DataFrame, ledger: Ledger, c: Config, ccy: bool) -> DataFrame:
+    acquisition_price, fx_rate = df[c._ACQUISITION_PRICE], df[c._FX_RATE]
+    if ccy:
+        avg_buying_price = acquisition_price
+    elif c._EXACT:
+        # NOTE: The product of the acquisition price in micro-units and the
+        # exchange rate in hundredths is an integer held exactly by float64,
+        # which is rounded half to even to hundredths.
+        avg_buying_price = (
+            (acquisition_price * exact.PRICE_SCALE).round()
+            * (fx_rate * exact.MONEY_SCALE).round()
+            / exact.PRICE_SCALE
+        ).round() / exact.MONEY_SCALE
+    else:
+        avg_buying_price = acquisition_price * fx_rate
+
+    # NOTE: Before the first transaction of an asset (or before the first year
+    # of the ledger) there is no position, which is shown as 0. A missing price
+    # of a position (e.g., missing market data) stays missing.
+    df = DataFrame(
+        {
+            "Amount bought": df["Amount bought"],
+            "Amount sold": df["Amount sold"],
+            "Remaining": df["Remaining"],
+            "Average buying price": avg_buying_price,
+        }
+    ).mask(df["Transactions"].fillna(0.0).eq(0.0), 0.0)
+    return (
+        df.reset_index()
+        .pipe(_per_asset, ledger=ledger, c=c)
+        .round(
+            {
+                "Amount bought": 6,
+                "Amount sold": 6,
+                "Remaining": 6,
+                "Average buying price": 2,
+            }
+        )
+    )
+
+
+def calculate_statistics_for_years(
+    financial_years: list[N],
+    ledger: Ledger,
+    c: Config,
+    ccy: bool,
+) -> DataFrame:
+    with profiling.stage("aggregation") as stage:
+        # NOTE: The position at the end of a year after the last transaction is
+        # the one at the end of the last year with transactions, and before the
+        # first transaction there is no position.
+        last_year = ledger.years.stop - 1
+        df = ledger.snapshots.reindex(
+            MultiIndex.from_product(
+                [ledger.assets, np.minimum(financial_years, last_year)]
+            )
+        )
+        df.index = MultiIndex.from_product(
+            [ledger.assets, financial_years], names=[c._ASSET, "Year"]
+        )
+        stage.rows += len(df)
+        return _summary(df, ledger=ledger, c=c, ccy=ccy)
+
+
+def calculate_statistics_at(
+    dates: list[Timestamp], ledger: Ledger, c: Config, ccy: bool
+) -> DataFrame:
+    """Returns the position summary at the end of each of `dates` (e.g., month ends)."""
+    with profiling.stage("aggregation") as stage:
+        dates = DatetimeIndex(dates)
+        stops = ledger.transactions.index.searchsorted(dates, side="right")
+        df = _snapshots(
+            ledger.transactions, c, ledger.assets, stops, Index(dates.date, name="Date")
+        )
+        stage.rows += len(ledger.transactions)
+        return _summary(df, ledger=ledger, c=c, ccy=ccy)
+
+
+def calculate_statistics(
+    financial_year: N,
+    ledger: Ledger,
+    c: Config,
+    ccy: bool,
 ) -> DataFrame:
-    df = calculate_PNL(df=df, c=c, ccy=ccy)
-    df = df.loc[df.index.year == financial_year]
+    return calculate_statistics_for_years(
+        [financial_year], ledger=ledger, c=c, ccy=ccy
+    ).drop(columns="Year")
+
+
+def _calculate_PNL(
+    ledger: Ledger, c: Config, ccy: bool, financial_years: list[N] | None = None
+) -> DataFrame:
+    with profiling.stage("P&L") as stage:
+        # NOTE: This is an overloading trick, `c._PNL` is denominated in same
+        # currency as the asset (i.e., `c._PRICE`) and `c._FX_RATE` transforms
+        # `c._PNL` and `c._PRICE` to the domestic currency. Setting the foreign
+        # exchange rates to 1 ensures that the rates shown next to `c._PNL` and
+        # `c._PRICE` stay in the asset-denominated currency.
+        df = ledger.transactions
+        pnl = c._PNL if ccy else c._DOMESTIC_PNL
+
+        rows = ledger.sells
+        if financial_years is not None:
+            rows = _year_rows(ledger, financial_years, rows)
+        stage.rows += len(rows)
+
+        # NOTE: Every column of the sell transactions is taken once by position
+        # (transactions of different assets can share a date).
+        columns = {
+            c._ASSET: _assets(df, c).array,
+            c._AMOUNT: df[c._AMOUNT].to_numpy(),
+            c._PRICE: df[c._PRICE].to_numpy(),
+            c._FX_RATE: df[c._FX_RATE].to_numpy(),
+            c._ACQUISITION_PRICE: df[c._ACQUISITION_PRICE].to_numpy(),
+            c._PNL: df[pnl].to_numpy(),
+        }
+        df = DataFrame(
+            {key: values[rows] for key, values in columns.items()},
+            index=df.index[rows],
+            copy=False,
+        )
+        if ccy:
+            df[c._FX_RATE] = 1
+        return df
+
+
+def calculate_PNL(ledger: Ledger, c: Config, ccy: bool) -> DataFrame:
+    df = _calculate_PNL(ledger=ledger, c=c, ccy=ccy)
+    return _per_asset(df, ledger=ledger, c=c)
+
+
+def calculate_PNL_for_years(
+    financial_years: list[N], ledger: Ledger, c: Config, ccy: bool
+) -> DataFrame:
+    df = _calculate_PNL(ledger=ledger, c=c, ccy=ccy, financial_years=financial_years)
+    df = _per_asset(df, ledger=ledger, c=c)
     df.index = df.index.date
     return df
 
 
-def calculate_skatteverket(
-    financial_year: N,
-    df: DataFrame,
+def calculate_PNL_per_year(
+    financial_year: N, ledger: Ledger, c: Config, ccy: bool
+) -> DataFrame:
+    return calculate_PNL_for_years([financial_year], ledger=ledger, c=c, ccy=ccy)
+
+
+def iter_PNL(
+    transactions: Iterable[tuple],
+    ccy: bool,
+    financial_years: list[N] | None = None,
+) -> Iterator[tuple]:
+    """Yields the P&L of every sell transaction as soon as it is known.
+
+    `transactions` are tuples of the date, the asset, the amount, the price and
+    the FX rate in chronological order (e.g., from `io.stream_input_files`).
+    The fold of `_average_cost` runs over them with the held amount and the
+    acquisition price of every asset as its only state, so the memory doesn't
+    grow with the number of transactions. Every yielded tuple holds the date,
+    the asset, the amount, the price, the FX rate, the acquisition price and the
+    P&L of a sell transaction, the same values as in `calculate_PNL`.
+    """
+    state: dict[str, tuple[R, R]] = {}
+    years = None
+    if financial_years is not None:
+        years, last_year = set(financial_years), max(financial_years, default=0)
+    for date, asset, amount, price, fx_rate in transactions:
+        # NOTE: The transactions after the last of `financial_years` aren't read.
+        if years is not None and date.year > last_year:
+            return
+
+        cost = price if amount > 0 else -price if amount < 0 else 0.0
+        if asset not in state:
+            held, acquisition_price = 0.0, cost
+        else:
+            held, acquisition_price = state[asset]
+            if cost >= 0 and held + amount == 0:
+                if amount > 0:
+                    acquisition_price = cost
+            elif cost >= 0:
+                acquisition_price = (acquisition_price * held + cost * amount) / (
+                    held + amount
+                )
+        state[asset] = (held + amount, acquisition_price)
+
+        if amount >= 0 or (years is not None and date.year not in years):
+            continue
+        # NOTE: The P&L is calculated like in `build_ledger` and the FX rate is
+        # 1 in the asset price currency (see `_calculate_PNL`).
+        if ccy:
+            pnl, fx_rate = (-1 * amount) * (price - acquisition_price), 1
+        else:
+            pnl = (-1 * amount) * fx_rate * (price - acquisition_price)
+        yield date, asset, amount, price, fx_rate, acquisition_price, pnl
+
+
+def calculate_skatteverket_for_years(
+    financial_years: list[N],
+    ledger: Ledger,
     c: Config,
     ccy: bool,
 ) -> DataFrame:
-    df_transactions = df.loc[df.index.year == financial_year]
-    bought_amount: R = df_transactions.loc[
-        df_transactions[c._AMOUNT] > 0, c._AMOUNT
-    ].sum()
-    sold_amount: R = df_transactions.loc[
-        df_transactions[c._AMOUNT] < 0, c._AMOUNT
-    ].sum()
-
-    df_pnl = calculate_PNL(df=df, c=c, ccy=ccy)
-    df_pnl = df_pnl.loc[df_pnl.index.year == financial_year]
-
-    if not ccy:
-        pass
-    else:
-        df_transactions.loc[:, c._FX_RATE] = 1
-        df_pnl.loc[:, c._FX_RATE] = 1
+    with profiling.stage("aggregation") as stage:
+        df = ledger.transactions
+        df_pnl = _calculate_PNL(
+            ledger=ledger, c=c, ccy=ccy, financial_years=financial_years
+        )
 
-    recieved = (
-        df_transactions.loc[df_transactions[c._AMOUNT] < 0]
-        .assign(Received=lambda x: (-1 * x[c._AMOUNT]) * x[c._PRICE] * x[c._FX_RATE])
-        .Received.sum()
-    )
+        # NOTE: Only the transactions from the first to the last financial year
+        # are summed.
+        rows = slice(
+            _year_bounds(ledger, min(financial_years))[0],
+            _year_bounds(ledger, max(financial_years))[1],
+        )
+        amount, scale = _amounts(df, c)
+        amount = amount.to_numpy()[rows]
+        df_transactions = DataFrame(
+            {
+                "Amount bought": np.where(amount > 0, amount, 0),
+                "Amount sold": np.where(amount < 0, amount, 0),
+            }
+        ).groupby(
+            [_assets(df, c).array[rows], _year_labels(ledger, rows)], observed=True
+        )
 
-    payed = df_pnl.assign(
-        Payed=lambda x: x[c._AMOUNT] * x[c._ACQUISITION_PRICE] * x[c._FX_RATE]
-    ).Payed.sum()
+        if c._EXACT:
+            received, payed = exact.sales(*_exact_units(df_pnl, c))
+            sales = {
+                "Received": received,
+                "Payed": -payed,
+                "Taxable": exact.deduct(received - payed, c._DEDUCTIBLE),
+            }
+            money_scale = exact.MONEY_SCALE
+        else:
+            sales = {
+                "Received": (-1 * df_pnl[c._AMOUNT])
+                * df_pnl[c._PRICE]
+                * df_pnl[c._FX_RATE],
+                "Payed": df_pnl[c._AMOUNT]
+                * df_pnl[c._ACQUISITION_PRICE]
+                * df_pnl[c._FX_RATE],
+                "Taxable": df_pnl[c._PNL].where(
+                    df_pnl[c._PNL] > 0, c._DEDUCTIBLE * df_pnl[c._PNL]
+                ),
+            }
+            money_scale = 1
+        sell_rows = _year_rows(ledger, financial_years, ledger.sells)
+        df_sales = DataFrame(sales, index=df_pnl.index).groupby(
+            [df_pnl[c._ASSET], _years_of(ledger, sell_rows)], observed=True
+        )
 
-    df_pnl[c._TAXABLE] = df_pnl.loc[:, c._PNL].apply(
-        lambda pnl: pnl if pnl > 0 else c._DEDUCTIBLE * pnl
-    )
-    taxable = df_pnl[c._TAXABLE].sum()
+        df_rv = (
+            concat([df_transactions.sum(), df_sales.sum()], axis=1)
+            .reindex(
+                MultiIndex.from_product(
+                    [ledger.assets, financial_years], names=[c._ASSET, "Year"]
+                )
+            )
+            .fillna(0.0)
+        )
 
-    df_rv = DataFrame(
-        {
-            "Amount bought": [bought_amount],
-            "Amount sold": [sold_amount],
-            "Received": [recieved],
-            "Payed": [payed],
-            "Taxable": [taxable],
-        }
-    ).round(
-        {
-            "Amount bought": 6,
-            "Amount sold": 6,
-            "Received": 2,
-            "Payed": 2,
-            "Taxable": 2,
-        }
-    )
-    return df_rv
+        # NOTE: The portfolio line adds up the amounts of money of all the assets,
+        # which is meaningful only when they are denominated in the same currency.
+        if len(ledger.assets) > 1 and (not ccy or df[c._ASSET_CURRENCY].nunique() == 1):
+            df_portfolio = df_rv.groupby(level="Year", sort=False)[
+                ["Received", "Payed", "Taxable"]
+            ].sum()
+            df_portfolio.index = MultiIndex.from_product(
+                [[c._PORTFOLIO], df_portfolio.index], names=[c._ASSET, "Year"]
+            )
+            df_rv = concat([df_rv, df_portfolio])
+
+        df_rv[["Amount bought", "Amount sold"]] /= scale
+        df_rv[["Received", "Payed", "Taxable"]] /= money_scale
+
+        stage.rows += len(df)
+        df_rv = (
+            df_rv.reset_index()
+            .pipe(_per_asset, ledger=ledger, c=c)
+            .round(
+                {
+                    "Amount bought": 6,
+                    "Amount sold": 6,
+                    "Received": 2,
+                    "Payed": 2,
+                    "Taxable": 2,
+                }
+            )
+        )
+        return df_rv
+
+
+def calculate_skatteverket(
+    financial_year: N,
+    ledger: Ledger,
+    c: Config,
+    ccy: bool,
+) -> DataFrame:
+    return calculate_skatteverket_for_years(
+        [financial_year], ledger=ledger, c=c, ccy=ccy
+    ).drop(columns="Year")
 
 
 def calculate_forex_transactions(df_asset: DataFrame, c: Config) -> DataFrame:
@@ -235,3 +795,25 @@ def calculate_forex_transactions(df_asset: DataFrame, c: Config) -> DataFrame:
         },
         index=df_asset.index,
     )
+
+
+def combine_forex_transactions(df_asset: DataFrame, c: Config) -> DataFrame:
+    """Returns the asset transactions merged chronologically with their FX transactions.
+
+    The FX transactions (see `calculate_forex_transactions`) of all the assets
+    priced in the same currency are one more asset named after the currency
+    (e.g., USD) and priced in the domestic currency, so a single ledger holds
+    the average cost of the assets and of the asset-denominated currencies.
+    Assets priced in the domestic currency have no FX transactions.
+    """
+    asset_currencies = df_asset[c._ASSET_CURRENCY].astype(str).to_numpy()
+    is_foreign = asset_currencies != c._DOMESTIC_CURRENCY
+    df_forex = calculate_forex_transactions(df_asset.loc[is_foreign], c)
+    df_forex[c._ASSET] = asset_currencies[is_foreign]
+    df_forex[c._ASSET_CURRENCY] = c._DOMESTIC_CURRENCY
+
+    # NOTE: The FX transactions follow the asset transactions of the same date.
+    df = concat(
+        [df_asset.astype({c._ASSET: str, c._ASSET_CURRENCY: str}), df_forex]
+    ).sort_index(kind="stable")
+    return df.astype({c._ASSET: "category", c._ASSET_CURRENCY: "category"})
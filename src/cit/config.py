@@ -16,7 +16,16 @@ class Config:
     _PRICE: str = "market price"
     _FX_RATE: str = "exchange rate"
     _ACQUISITION_PRICE: str = "acquisition price"
+    _HELD_AMOUNT: str = "held amount"
     _PNL: str = "P&L"
+    _DOMESTIC_PNL: str = "domestic P&L"
     _TAXABLE: str = "taxable"
+    _PORTFOLIO: str = "Portfolio"
     _DEDUCTIBLE: R = 0.7
+    _EXACT: bool = False
     _DOMESTIC_CURRENCY: str = "SEK"
+    _PRICES: str = "yahoo"
+    _CACHE_PATH: str = "./.cit-cache"
+    _INPUT_CACHE: bool = False
+    _PRICE_LOOKBACK_DAYS: int = 7
+    _DOWNLOAD_WORKERS: int = 8
@@ -0,0 +1,108 @@
+"""Fixed-point arithmetic of the exact mode (`Config._EXACT`).
+
+Amounts and prices are held as integer micro-units and exchange rates and
+amounts of money as integer hundredths (i.e., öre or cents), which holds the
+values that `load_input_files` rounds to without any error. Sums of these
+integers are exact and every division or conversion rounds half to even at a
+defined point:
+
+- The acquisition price is rounded to the micro-unit after every buy.
+
+- The proceeds (`-amount * price`) and the cost (`-amount * acquisition price`)
+  of a sell are rounded to 1/10000 of the asset-denominated currency, and then
+  to the hundredth of the asset-denominated and of the domestic currency (i.e.,
+  after multiplying by the exchange rate). The profit and loss of a sell is the
+  difference of the rounded proceeds and cost, so the reports reconcile to the
+  hundredth.
+
+- The taxable part of a loss (`c._DEDUCTIBLE`) is rounded to the hundredth.
+"""
+from fractions import Fraction
+
+import numpy as np
+
+AMOUNT_SCALE = 10**6
+
+PRICE_SCALE = 10**6
+
+MONEY_SCALE = 10**2
+
+_CONVERSION_SCALE = 10**4
+
+# NOTE: Products of two scaled values must fit in int64 with room to spare.
+_LIMIT = 2.0**62
+
+
+def to_units(values: np.ndarray, scale: int, name: str) -> np.ndarray:
+    """Returns the decimal `values` as integers of 1/`scale` (e.g., micro-units)."""
+    units = np.rint(np.asarray(values, dtype=np.float64) * scale)
+    if not np.isfinite(units).all():
+        print(f"ValueError: The exact mode requires every {name} to be known")
+        raise SystemExit(1)
+    return units.astype(np.int64)
+
+
+def from_units(units: np.ndarray, scale: int) -> np.ndarray:
+    return units / scale
+
+
+def multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if (np.abs(a.astype(np.float64)) * np.abs(b.astype(np.float64)) >= _LIMIT).any():
+        raise OverflowError("value too large for the exact mode")
+    return a * b
+
+
+def div_round(n: np.ndarray, d: int) -> np.ndarray:
+    """Returns `n / d` rounded half to even for integer arrays `n` and `d` > 0."""
+    q, r = np.divmod(n, d)
+    return q + ((2 * r > d) | ((2 * r == d) & (q % 2 == 1)))
+
+
+def div_round_int(n: int, d: int) -> int:
+    """Returns `n / d` rounded half to even for integers `n` and `d` != 0."""
+    if d < 0:
+        n, d = -n, -d
+    q, r = divmod(n, d)
+    return q + (2 * r > d or (2 * r == d and q % 2 == 1))
+
+
+def _amount_times_price(amounts: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    # NOTE: The product of micro-units overflows int64 from about 9.2 million of
+    # the asset-denominated currency, therefore, the whole units and the
+    # fractions of the amounts are multiplied separately and the product is
+    # rounded to 1/10000 of the currency, which is exact for |amount| < 2**63 /
+    # (price in micro-units).
+    d = AMOUNT_SCALE * PRICE_SCALE // _CONVERSION_SCALE
+    sign, amounts = np.sign(amounts), np.abs(amounts)
+    whole, fraction = np.divmod(amounts, AMOUNT_SCALE)
+    q_whole, r_whole = np.divmod(multiply(whole, prices), d // AMOUNT_SCALE)
+    q_fraction, r_fraction = np.divmod(multiply(fraction, prices), d)
+    carry, r = np.divmod(r_whole * AMOUNT_SCALE + r_fraction, d)
+    q = q_whole + q_fraction + carry
+    return sign * (q + ((2 * r > d) | ((2 * r == d) & (q % 2 == 1))))
+
+
+def sales(
+    amounts: np.ndarray,
+    prices: np.ndarray,
+    acquisition_prices: np.ndarray,
+    fx_rates: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the proceeds and the cost (in hundredths) of the sells `amounts`.
+
+    The amounts and the prices are in micro-units, the exchange rates in
+    hundredths convert the proceeds and the cost from the asset-denominated
+    currency.
+    """
+    proceeds = _amount_times_price(-amounts, prices)
+    cost = _amount_times_price(-amounts, acquisition_prices)
+    return (
+        div_round(multiply(proceeds, fx_rates), _CONVERSION_SCALE),
+        div_round(multiply(cost, fx_rates), _CONVERSION_SCALE),
+    )
+
+
+def deduct(pnl: np.ndarray, deductible: float) -> np.ndarray:
+    """Returns the taxable part (in hundredths) of the profit and loss `pnl`."""
+    ratio = Fraction(deductible).limit_denominator(10**6)
+    return np.where(pnl > 0, pnl, div_round(pnl * ratio.numerator, ratio.denominator))
@@ -1,6 +1,38 @@
+import csv
+from dataclasses import dataclass
+import json
 from numbers import Integral as N
+from typing import IO, Iterable
+
 from pandas import DataFrame
 
+from src.cit import profiling
+
+TABLE = "table"
+
+FORMATS = [TABLE, "csv", "json", "jsonl", "parquet"]
+
+# NOTE: The formats with a line per row, which are written while the rows are
+# calculated.
+STREAM_FORMATS = ["csv", "jsonl"]
+
+_CHUNK_SIZE = 100_000
+
+_INDEX_LABEL = "date"
+
+
+@dataclass
+class Report:
+    """Report `df` with its `title` and the names of its columns (`m`) to show.
+
+    The index of `df` (i.e., the date of each row) is shown when `index`.
+    """
+
+    df: DataFrame
+    title: str
+    m: dict
+    index: bool
+
 
 def _format_DF(md_table: str, title: str) -> str:
     first_row = md_table.split()[0]
@@ -10,7 +42,76 @@ def _format_DF(md_table: str, title: str) -> str:
 
 
 def format_DF(df: DataFrame, title: str, m: dict, index: bool) -> str:
-    df = df.rename(columns=m)
+    # NOTE: Missing values (e.g., amounts in the portfolio line) are blank.
+    df = df.rename(columns=m).astype(object).where(df.notna().to_numpy(), None)
     markdown_table = df.to_markdown(index=index, tablefmt="grid")
     titled_markedown_table = _format_DF(markdown_table, title)
     return titled_markedown_table
+
+
+def _write_json(df: DataFrame, f: IO, lines: bool) -> None:
+    # NOTE: The rows are serialized in chunks, so that a large report doesn't
+    # have to be held as a single string.
+    if not lines:
+        f.write("[")
+    for start in range(0, len(df), _CHUNK_SIZE):
+        records = df.iloc[start : start + _CHUNK_SIZE].to_json(
+            orient="records", lines=lines
+        )
+        if lines:
+            f.write(records if records.endswith("\n") else records + "\n")
+        else:
+            f.write(("," if start else "") + records[1:-1])
+    if not lines:
+        f.write("]\n")
+
+
+def write_report(report: Report, fmt: str, f: IO) -> None:
+    """Writes `report` to `f` in the format `fmt` (one of `FORMATS`).
+
+    Only the table has a title, the other formats hold just the rows, which are
+    written without going through `tabulate`. Parquet is written to the binary
+    buffer of `f` when `f` is a text stream (e.g., `sys.stdout`).
+    """
+    with profiling.stage("formatting") as stage:
+        stage.rows += len(report.df)
+        if fmt == TABLE:
+            print(format_DF(report.df, report.title, report.m, report.index), file=f)
+            return
+
+        df = report.df.rename(columns=report.m)
+        if report.index:
+            index = df.index if fmt in {"csv", "parquet"} else df.index.astype(str)
+            df = df.set_axis(index.rename(_INDEX_LABEL)).reset_index()
+
+        if fmt == "csv":
+            df.to_csv(f, index=False, chunksize=_CHUNK_SIZE)
+        elif fmt == "json":
+            _write_json(df, f, lines=False)
+        elif fmt == "jsonl":
+            _write_json(df, f, lines=True)
+        elif fmt == "parquet":
+            f.flush()
+            df.to_parquet(getattr(f, "buffer", f), index=False)
+
+
+def write_records(records: Iterable[tuple], columns: list[str], fmt: str, f: IO) -> N:
+    """Writes every record of `records` to `f` as soon as it is produced.
+
+    A record holds the date and the values of `columns`, and the format `fmt` is
+    one of `STREAM_FORMATS`. Returns the number of written records.
+    """
+    names = [_INDEX_LABEL, *columns]
+    rows = 0
+    if fmt == "csv":
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(names)
+        for rows, record in enumerate(records, start=1):
+            writer.writerow(record)
+    else:
+        # NOTE: One encoder for all the records, `json.dumps` creates an
+        # encoder per call when it has arguments.
+        encode = json.JSONEncoder(default=str, separators=(",", ":")).encode
+        for rows, record in enumerate(records, start=1):
+            f.write(encode(dict(zip(names, record))) + "\n")
+    return rows
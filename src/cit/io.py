@@ -1,12 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+import heapq
+import itertools
 import json
+from operator import itemgetter
+import os
 from pathlib import Path
 import textwrap
+from typing import BinaryIO, Iterable, Iterator, NoReturn
+import zipfile
+
+import numpy as np
+from pandas import (
+    Categorical,
+    DataFrame,
+    DatetimeIndex,
+    Series,
+    Timedelta,
+    Timestamp,
+    concat,
+    merge_asof,
+    to_datetime,
+)
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from src.cit import profiling
+from src.cit.cache import load_input_cache, open_market_data_cache, save_input_cache
+from src.cit.calculation import Checkpoint
+from src.cit.config import Config
+from src.cit.prices import PriceProvider, get_price_provider
 
-from pandas import DataFrame, concat
-import yfinance as yf
+_CHUNK_SIZE = 65536
 
-from src.cit.config import Config
+_COLUMNAR_SUFFIXES = {".parquet", ".feather", ".csv"}
+
+_SIDECAR_SUFFIX = ".meta.json"
 
 
 def read_json(filename: str) -> dict:
@@ -19,52 +52,296 @@ def read_json(filename: str) -> dict:
         raise SystemExit(1)
 
 
-def check_transaction_data_type(transactions: list[dict], c: Config) -> str:
-    df = DataFrame(transactions)
+def _unknown_transaction_data_type() -> NoReturn:
+    msg = textwrap.dedent(
+        """
+        Unknown format of transaction data
 
-    if {c._DATE, c._AMOUNT}.issuperset(df):
-        rv = c._BASIC
-    elif {c._DATE, c._AMOUNT, c._PRICE, c._FX_RATE}.issuperset(df):
-        rv = c._COMPLETE
-    else:
-        msg = textwrap.dedent(
-            """
-            Unknown format of transaction data
+        See examples of JSON input files in ./data or reconfigure
+        ./_config.py."""
+    )
+    print(msg)
+    raise SystemExit(1)
 
-            See examples of JSON input files in ./data or reconfigure
-            ./_config.py."""
-        )
-        print(msg)
-        raise SystemExit(1)
+
+def _transaction_data_type(keys: set[str], c: Config) -> str:
+    with profiling.stage("schema check"):
+        if {c._DATE, c._AMOUNT}.issuperset(keys):
+            rv = c._BASIC
+        elif {c._DATE, c._AMOUNT, c._PRICE, c._FX_RATE}.issuperset(keys):
+            rv = c._COMPLETE
+        else:
+            _unknown_transaction_data_type()
 
     return rv
 
 
+def check_transaction_data_type(transactions: list[dict], c: Config) -> str:
+    return _transaction_data_type(set().union(*transactions), c)
+
+
 def read_json_with_config(c: Config) -> dict:
     dir_path, input_file = Path(c._DATA_PATH), c._INPUT_FILE
     return read_json(dir_path / input_file)
 
 
-def _frame_transactions(transactions: dict, c: Config) -> DataFrame:
+def _column_dtypes(c: Config) -> dict[str, np.dtype]:
+    return {
+        c._DATE: np.dtype("datetime64[ns]"),
+        c._AMOUNT: np.dtype(np.float64),
+        c._PRICE: np.dtype(np.float64),
+        c._FX_RATE: np.dtype(np.float64),
+    }
+
+
+def _column_decimals(c: Config) -> dict[str, int]:
+    return {c._AMOUNT: 6, c._PRICE: 2, c._FX_RATE: 2}
+
+
+def _round_columns(columns: dict[str, np.ndarray], c: Config) -> dict[str, np.ndarray]:
+    # NOTE: Writable columns are rounded in place, read-only columns (e.g., Arrow
+    # columns handed over without copying) into a new array.
+    for key, decimals in _column_decimals(c).items():
+        if key in columns:
+            values = columns[key]
+            columns[key] = np.round(
+                values, decimals, out=values if values.flags.writeable else None
+            )
+    return columns
+
+
+def _frame_transactions(
+    transactions: Iterable[dict], c: Config
+) -> tuple[DataFrame, str]:
+    """Returns the transactions framed in typed columns and their data type.
+
+    The transactions are consumed once, in chunks of `_CHUNK_SIZE` records that
+    are converted to NumPy arrays, so `transactions` can be a stream. The data
+    type (BASIC or COMPLETE) is detected from the keys of the first transaction
+    and every other transaction must fit it.
+    """
+    dtypes = _column_dtypes(c)
+
+    data_type, keys, allowed_keys = None, [], set()
+    chunks: dict[str, list[np.ndarray]] = {key: [] for key in dtypes}
+    rows: list[tuple] = []
+
+    def _flush() -> None:
+        for key, values in zip(keys, zip(*rows)):
+            if key == c._DATE:
+                values = to_datetime(list(values))
+            chunks[key].append(np.asarray(values, dtype=dtypes[key]))
+        rows.clear()
+
+    for transaction in transactions:
+        if data_type is None:
+            data_type = _transaction_data_type(set(transaction), c)
+            keys = [c._DATE, c._AMOUNT]
+            if data_type == c._COMPLETE:
+                keys += [c._PRICE, c._FX_RATE]
+            allowed_keys = set(keys)
+        elif not allowed_keys.issuperset(transaction):
+            _unknown_transaction_data_type()
+
+        rows.append(tuple(transaction.get(key, np.nan) for key in keys))
+        if len(rows) == _CHUNK_SIZE:
+            _flush()
+    _flush()
+
+    if data_type is None:
+        data_type = _transaction_data_type(set(), c)
+        keys = [c._DATE, c._AMOUNT]
+
+    columns = {
+        key: np.concatenate(chunks[key]) if chunks[key] else np.array([], dtypes[key])
+        for key in keys
+    }
+    return _frame_columns(columns, c), data_type
+
+
+def _frame_columns(columns: dict[str, np.ndarray], c: Config) -> DataFrame:
+    # NOTE: The frame is a view of `columns`, sorting is the only copy and it
+    # is needed only when the transactions aren't in chronological order.
+    df = DataFrame(
+        {key: values for key, values in columns.items() if key != c._DATE},
+        index=DatetimeIndex(columns[c._DATE], name=c._DATE),
+        copy=False,
+    )
+    return df if df.index.is_monotonic_increasing else df.sort_index()
+
+
+def _stream_transactions(fhandle: BinaryIO, c: Config) -> tuple[dict, Iterator[dict]]:
+    # NOTE: The transactions are built by the parser of `ijson` (in C with the
+    # yajl2_c backend) because handling its events in Python is slower than
+    # `json.load`. The asset metadata usually precedes the transactions, so it
+    # is found right at the beginning of the file.
+    header = {}
+    for key in [c._ASSET, c._ASSET_CURRENCY]:
+        fhandle.seek(0)
+        value = next(ijson.items(fhandle, key), None)
+        if value is not None:
+            header[key] = value
+
+    fhandle.seek(0)
+    return header, ijson.items(fhandle, f"{c._TRANSACTIONS}.item", use_float=True)
+
+
+def is_input_file(path: Path) -> bool:
     return (
-        DataFrame(data=transactions)
-        .astype({c._DATE: "datetime64[ns]"})
-        .set_index(c._DATE)
-        .sort_index()
+        path.is_file()
+        and path.suffix in {".json", *_COLUMNAR_SUFFIXES}
+        and not path.name.endswith(_SIDECAR_SUFFIX)
     )
 
 
-def frame_transactions(d: dict, c: Config) -> DataFrame:
+def _read_json_transactions(filename: Path, c: Config) -> tuple[dict, DataFrame, str]:
+    # NOTE: The input file is cached with its state before it is read, so a
+    # change while reading it isn't hidden by the cache.
+    if c._INPUT_CACHE:
+        stat = filename.stat()
+        cached = load_input_cache(filename, stat, list(_column_dtypes(c)))
+        if cached is not None:
+            header, columns, data_type = cached
+            return header, _frame_columns(columns, c), data_type
+
+    with open(filename, "rb") as fhandle:
+        if ijson is None:
+            header = json.load(fhandle)
+            transactions = header.pop(c._TRANSACTIONS)
+        else:
+            header, transactions = _stream_transactions(fhandle, c)
+        df, data_type = _frame_transactions(transactions, c)
+
+    # NOTE: The columns are cached rounded, so the memory-mapped columns of a
+    # cached file are used as they are.
+    columns = {c._DATE: df.index.to_numpy()}
+    columns.update((key, df[key].to_numpy()) for key in df.columns)
+    _round_columns(columns, c)
+    if c._INPUT_CACHE:
+        save_input_cache(filename, stat, header, columns, data_type)
+    return header, _frame_columns(columns, c), data_type
+
+
+def _read_table(filename: Path) -> "pyarrow.Table":
+    # NOTE: The readers of `pyarrow` are imported only for columnar input files
+    # because importing them adds to the startup time of every run.
+    if filename.suffix == ".csv":
+        from pyarrow import csv
+
+        return csv.read_csv(filename)
+    elif filename.suffix == ".feather":
+        from pyarrow import feather
+
+        return feather.read_table(filename)
+    else:
+        from pyarrow import parquet
+
+        return parquet.read_table(filename)
+
+
+def _read_columnar_transactions(
+    filename: Path, c: Config
+) -> tuple[dict, DataFrame, str]:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print(f'ImportError: Reading "{filename}" requires the pyarrow package')
+        raise SystemExit(1)
+
+    table = _read_table(filename)
+    data_type = _transaction_data_type(set(table.column_names), c)
+
+    # NOTE: Arrow columns of the right type without missing values are handed
+    # over to the frame without copying.
+    columns = {
+        name: table.column(name).cast(pa.from_numpy_dtype(dtype)).to_numpy()
+        for name, dtype in _column_dtypes(c).items()
+        if name in table.column_names
+    }
+
+    return (
+        _columnar_header(filename, table.schema, c),
+        _frame_columns(_round_columns(columns, c), c),
+        data_type,
+    )
+
+
+def _columnar_header(filename: Path, schema: "pyarrow.Schema", c: Config) -> dict:
+    # NOTE: The asset metadata is read from the schema metadata of the file
+    # (e.g., written with `pyarrow.Table.replace_schema_metadata`) and from the
+    # sidecar file `<name>.meta.json`, the sidecar file takes precedence.
+    metadata = schema.metadata or {}
+    header = {
+        key.decode(): value.decode()
+        for key, value in metadata.items()
+        if key.decode() in {c._ASSET, c._ASSET_CURRENCY}
+    }
+    sidecar = filename.with_suffix(_SIDECAR_SUFFIX)
+    if sidecar.exists():
+        header.update(read_json(sidecar))
+
+    for key in [c._ASSET, c._ASSET_CURRENCY]:
+        if key not in header:
+            print(
+                f'ImportError: "{key}" is missing from the metadata of "{filename}" '
+                f'and from "{sidecar}"'
+            )
+            raise SystemExit(1)
+
+    return header
+
+
+def read_transactions_file(filename: str, c: Config) -> tuple[dict, DataFrame, str]:
+    """Returns the top-level values, the framed transactions and their data type.
+
+    The format of the file is chosen by its extension: JSON (`.json`), Parquet
+    (`.parquet`), Feather (`.feather`) or CSV (`.csv`). The columnar formats
+    have a column per transaction key and are read with `pyarrow`. With `ijson`
+    installed the transactions of JSON files are streamed from the file instead
+    of loading the whole JSON document first.
+    """
+    filename = Path(filename)
+    try:
+        if filename.suffix in _COLUMNAR_SUFFIXES:
+            return _read_columnar_transactions(filename, c)
+        else:
+            return _read_json_transactions(filename, c)
+    except FileNotFoundError:
+        print(f'ImportError: Input file "{filename}" doesn\'t exist')
+        raise SystemExit(1)
+
+
+def _read_transactions(d: dict, c: Config) -> tuple[DataFrame, str]:
+    return _frame_transactions(d[c._TRANSACTIONS], c)
+
+
+def _fx_ticker(currency: str) -> str:
+    # NOTE: FX tickers in Yahoo Finance (i.e., SEKUSD=X is SEK/USD)
+    return f"{currency}USD=X"
+
+
+def _market_data_needs(
+    d: dict, df: DataFrame, data_type: str, c: Config
+) -> dict[str, DatetimeIndex]:
+    if data_type == c._BASIC:
+        return {d[c._ASSET]: df.index, _fx_ticker(c._DOMESTIC_CURRENCY): df.index}
+    else:
+        return {}
+
+
+def _complement_transactions(
+    d: dict,
+    df: DataFrame,
+    data_type: str,
+    market_data: dict[str, DataFrame],
+    c: Config,
+) -> DataFrame:
     currency = c._DOMESTIC_CURRENCY
 
     asset = d[c._ASSET]
-    transactions = d[c._TRANSACTIONS]
-
-    df = _frame_transactions(transactions, c)
 
-    data_type = check_transaction_data_type(transactions, c)
     if data_type == c._BASIC:
-        df = complement_basic_data(asset, currency, df, c)
+        df = _complement_basic_data(asset, currency, df, market_data, c)
     elif data_type == c._COMPLETE:
         pass
     else:
@@ -73,68 +350,429 @@ def frame_transactions(d: dict, c: Config) -> DataFrame:
     return df
 
 
+def frame_transactions(d: dict, c: Config) -> DataFrame:
+    df, data_type = _read_transactions(d, c)
+    market_data = fetch_market_data(_market_data_needs(d, df, data_type, c), c)
+    return _complement_transactions(d, df, data_type, market_data, c)
+
+
+def _compute_mid_prices(df: DataFrame) -> DataFrame:
+    return df.assign(Mid=lambda df: (df.Open + df.Close) / 2).Mid.to_frame()
+
+
 def compute_mid_prices(df: DataFrame) -> DataFrame:
-    df = (
-        df.asfreq("D", method="ffill")
-        .assign(Mid=lambda df: (df.Open + df.Close) / 2)
-        .Mid.to_frame()
-    )
-    return df
+    return _compute_mid_prices(df.asfreq("D", method="ffill"))
 
 
-def download(ticker: str, start_date: datetime, end_date: datetime) -> DataFrame:
-    df = yf.download(ticker, start=start_date, end=end_date, progress=False)
-    return compute_mid_prices(df)
+def _download(
+    provider: PriceProvider,
+    ticker: str,
+    start_date: datetime,
+    end_date: datetime,
+    c: Config,
+) -> DataFrame:
+    if provider.remote and c._CACHE_PATH:
+        df = open_market_data_cache(c._CACHE_PATH).read(
+            ticker, start_date.date(), end_date.date(), fetch=provider.fetch
+        )
+    else:
+        df = provider.fetch(ticker, start_date, end_date)
+    return _compute_mid_prices(df)
 
 
-def complement_basic_data(
-    asset: str, currency: str, df_a: DataFrame, c: Config
+def download(
+    ticker: str, start_date: datetime, end_date: datetime, c: Config | None = None
 ) -> DataFrame:
-    start, end = df_a.index.year.min(), df_a.index.year.max()
+    """Returns mid prices for the trading days in [`start_date`, `end_date`)."""
+    c = Config() if c is None else c
+    return _download(get_price_provider(c), ticker, start_date, end_date, c)
+
+
+def _download_windows(
+    dates: DatetimeIndex, lookback: int
+) -> list[tuple[datetime, datetime]]:
+    """Returns the smallest set of date ranges [start, end) that cover every date
+    in `dates` together with `lookback` days before it."""
+    days = dates.normalize().unique().sort_values()
+    starts, ends = days - Timedelta(days=lookback), days + Timedelta(days=1)
+
+    # NOTE: A window is extended as long as the next window overlaps with it.
+    is_first = np.r_[True, starts[1:] > ends[:-1]]
+    is_last = np.r_[is_first[1:], True]
+
+    return list(
+        zip(
+            starts[is_first].to_pydatetime(),
+            ends[is_last].to_pydatetime(),
+        )
+    )
 
-    df_b = download(
-        ticker=asset,
-        start_date=datetime(year=start, month=1, day=1),
-        end_date=datetime(year=end, month=12, day=31),
-    ).rename(columns={"Mid": c._PRICE})
 
-    # NOTE: FX tickers in Yahoo Finance (i.e., SEKUSD=X is SEK/USD)
-    df_c = (
-        download(
-            ticker=f"{currency}USD=X",
-            start_date=datetime(year=start, month=1, day=1),
-            end_date=datetime(year=end, month=12, day=31),
+def fetch_market_data(
+    needs: dict[str, DatetimeIndex], c: Config
+) -> dict[str, DataFrame]:
+    """Returns mid prices around the needed dates of each ticker.
+
+    The downloads of all the tickers run concurrently in a pool of
+    `c._DOWNLOAD_WORKERS` threads, so the wall-clock time is close to the
+    slowest download instead of the sum of all of them.
+    """
+    provider = get_price_provider(c)
+    requests = [
+        (ticker, start, end)
+        for ticker, dates in needs.items()
+        for start, end in _download_windows(dates, c._PRICE_LOOKBACK_DAYS)
+    ]
+
+    with ThreadPoolExecutor(max_workers=c._DOWNLOAD_WORKERS) as executor:
+        dfs = list(
+            executor.map(
+                lambda request: _download(provider, *request, c=c),
+                requests,
+            )
         )
+
+    market_data = {}
+    for ticker in needs:
+        df = concat(
+            [df for (t, _, _), df in zip(requests, dfs) if t == ticker]
+        ).sort_index()
+        df.index = df.index.astype("datetime64[ns]")
+        market_data[ticker] = df[~df.index.duplicated()]
+    return market_data
+
+
+def _join_prices(dates: DatetimeIndex, prices: Series, c: Config) -> np.ndarray:
+    # NOTE: Each transaction takes the last price at or before its date (e.g.,
+    # Friday's price for a transaction on Sunday), which is the forward-fill of
+    # the prices over the days without market data.
+    return merge_asof(
+        DataFrame({c._DATE: dates}),
+        prices.rename_axis(c._DATE).reset_index(),
+        on=c._DATE,
+        direction="backward",
+        tolerance=Timedelta(days=c._PRICE_LOOKBACK_DAYS),
+    )[prices.name].to_numpy()
+
+
+def _complement_basic_data(
+    asset: str,
+    currency: str,
+    df_a: DataFrame,
+    market_data: dict[str, DataFrame],
+    c: Config,
+) -> DataFrame:
+    df_a = df_a.sort_index()
+
+    df_b = market_data[asset].rename(columns={"Mid": c._PRICE})
+
+    df_c = (
+        market_data[_fx_ticker(currency)]
         .apply(lambda x: 1 / x if x.name == "Mid" else x)  # i.e., SEK/USD -> USD/SEK
         .rename(columns={"Mid": c._FX_RATE})
     )
 
-    df_r = df_a.merge(
-        df_b.merge(df_c, left_index=True, right_index=True),
-        left_index=True,
-        right_index=True,
-        how="left",
+    df_r = df_a.assign(
+        **{
+            c._PRICE: _join_prices(df_a.index, df_b[c._PRICE], c),
+            c._FX_RATE: _join_prices(df_a.index, df_c[c._FX_RATE], c),
+        }
     )
 
+    # NOTE: A failed download (or no market data within the lookback days of a
+    # transaction) leaves the price missing, which would turn into wrong tax
+    # figures instead of an error.
+    for ticker, key in [(asset, c._PRICE), (_fx_ticker(currency), c._FX_RATE)]:
+        missing = df_r.index[df_r[key].isna()]
+        if len(missing):
+            dates = ", ".join(str(day.date()) for day in missing)
+            print(f'ImportError: Market data of "{ticker}" is missing for {dates}')
+            raise SystemExit(1)
+
     return df_r
 
 
+def complement_basic_data(
+    asset: str, currency: str, df_a: DataFrame, c: Config
+) -> DataFrame:
+    needs = {asset: df_a.index, _fx_ticker(currency): df_a.index}
+    market_data = fetch_market_data(needs, c)
+    return _complement_basic_data(asset, currency, df_a, market_data, c)
+
+
 def read_in_transactions(c: Config) -> DataFrame:
     return frame_transactions(read_json_with_config(c), c)
 
 
+@dataclass
+class InputFile:
+    """Metadata of an input file read by `load_input_files`."""
+
+    filename: Path
+    asset: str
+    asset_currency: str
+    data_type: str
+
+
+@dataclass
+class Dataset:
+    """Transactions of all the input files together with the metadata per file.
+
+    Every transaction is tagged with the asset (`c._ASSET`) and the asset price
+    currency (`c._ASSET_CURRENCY`) of its input file, both are categorical.
+    """
+
+    transactions: DataFrame
+    files: list[InputFile]
+
+
+def _categorical(values: list[str], lengths: list[int]) -> Categorical:
+    categories = list(dict.fromkeys(values))
+    codes = [categories.index(value) for value in values]
+    return Categorical.from_codes(np.repeat(codes, lengths), categories=categories)
+
+
+def _concat_transactions(
+    dfs: list[DataFrame], headers: list[dict], c: Config
+) -> DataFrame:
+    """Returns the transactions of every input file in one chronological frame.
+
+    The columns are built one at a time from the NumPy arrays of the files, so
+    the transactions are copied at most once (instead of once per `concat` and
+    `sort_index`) and the columns of a single file aren't copied at all. The
+    amounts and the prices come rounded from the files (see `_round_columns`),
+    and the asset and the asset price currency of every transaction are
+    categorical (i.e., a small integer code per transaction).
+    """
+    dates = np.concatenate([df.index.to_numpy() for df in dfs])
+    # NOTE: The files are merged by a stable sort, transactions on the same
+    # date keep the order of the input files.
+    order = None
+    if len(dfs) > 1 and not DatetimeIndex(dates).is_monotonic_increasing:
+        order = np.argsort(dates, kind="stable")
+        dates = dates[order]
+
+    columns = {}
+    for key in [c._AMOUNT, c._PRICE, c._FX_RATE]:
+        arrays = [df[key].to_numpy(dtype=np.float64) for df in dfs]
+        values = arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+        columns[key] = values if order is None else values[order]
+
+    lengths = [len(df) for df in dfs]
+    for key in [c._ASSET, c._ASSET_CURRENCY]:
+        values = _categorical([d[key] for d in headers], lengths)
+        columns[key] = values if order is None else values.take(order)
+
+    return DataFrame(columns, index=DatetimeIndex(dates, name=c._DATE), copy=False)
+
+
+def load_input_files(input_files: list, c: Config) -> Dataset:
+    # NOTE: Every input file is parsed once and `c` isn't modified, so the same
+    # configuration can be used to load and report in several threads.
+    with profiling.stage("load") as load:
+        files = [
+            read_transactions_file(Path(c._DATA_PATH) / input_file, c)
+            for input_file in input_files
+        ]
+
+        with profiling.stage("price complement") as complement:
+            # NOTE: The market data of all the files is fetched in one go, so a
+            # ticker that appears in several files (e.g., the FX rate) is
+            # fetched only once.
+            needs: dict[str, DatetimeIndex] = {}
+            for d, df, data_type in files:
+                for ticker, dates in _market_data_needs(d, df, data_type, c).items():
+                    needs[ticker] = (
+                        needs[ticker].append(dates) if ticker in needs else dates
+                    )
+            market_data = fetch_market_data(needs, c)
+
+            dfs = []
+            for d, df, data_type in files:
+                df = _complement_transactions(d, df, data_type, market_data, c)
+                if data_type == c._BASIC:
+                    # NOTE: The complemented market data is rounded like the
+                    # transactions of the input files.
+                    columns = {
+                        key: df[key].to_numpy() for key in [c._PRICE, c._FX_RATE]
+                    }
+                    df = df.assign(**_round_columns(columns, c))
+                    complement.rows += len(df)
+                dfs.append(df)
+
+        transactions = _concat_transactions(dfs, [d for d, _, _ in files], c)
+        load.rows += len(transactions)
+
+    return Dataset(
+        transactions=transactions,
+        files=[
+            InputFile(
+                filename=Path(c._DATA_PATH) / input_file,
+                asset=d[c._ASSET],
+                asset_currency=d[c._ASSET_CURRENCY],
+                data_type=data_type,
+            )
+            for input_file, (d, _, data_type) in zip(input_files, files)
+        ],
+    )
+
+
 def read_input_files(input_files: list, c: Config) -> DataFrame:
-    dfs = []
-    for input_file in input_files:
-        c._INPUT_FILE = input_file
+    return load_input_files(input_files, c).transactions
 
-        df: DataFrame = read_in_transactions(c).round(
-            {c._AMOUNT: 6, c._PRICE: 2, c._FX_RATE: 2}
+
+def _stream_json_file(filename: Path, c: Config) -> tuple[dict, str, Iterator[list]]:
+    fhandle = open(filename, "rb")
+    if ijson is None:
+        with fhandle:
+            header = json.load(fhandle)
+        transactions = iter(header.pop(c._TRANSACTIONS))
+    else:
+        header, transactions = _stream_transactions(fhandle, c)
+
+    # NOTE: The data type is detected from the first transaction, before any
+    # P&L is written.
+    first = next(transactions, None)
+    data_type = _transaction_data_type(set(first or ()), c)
+    keys = list(_column_dtypes(c))
+    allowed_keys = set(keys)
+
+    def _chunks() -> Iterator[list]:
+        try:
+            rows: list[tuple] = []
+            for transaction in itertools.chain([first], transactions):
+                if not allowed_keys.issuperset(transaction):
+                    _unknown_transaction_data_type()
+                rows.append(tuple(transaction.get(key, np.nan) for key in keys))
+                if len(rows) == _CHUNK_SIZE:
+                    yield list(zip(*rows))
+                    rows.clear()
+            if rows:
+                yield list(zip(*rows))
+        finally:
+            fhandle.close()
+
+    if first is None:
+        fhandle.close()
+        return header, data_type, iter(())
+    return header, data_type, _chunks()
+
+
+def _stream_columnar_file(
+    filename: Path, c: Config
+) -> tuple[dict, str, Iterator[list]]:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print(f'ImportError: Reading "{filename}" requires the pyarrow package')
+        raise SystemExit(1)
+
+    # NOTE: The files are read one record batch at a time (e.g., a block of a
+    # CSV file), only a row group of Parquet is read as a whole.
+    if filename.suffix == ".csv":
+        from pyarrow import csv
+
+        reader = csv.open_csv(filename)
+        schema, batches = reader.schema, reader
+    elif filename.suffix == ".feather":
+        reader = pa.ipc.open_file(filename)
+        schema = reader.schema
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        from pyarrow import parquet
+
+        reader = parquet.ParquetFile(filename)
+        schema, batches = reader.schema_arrow, reader.iter_batches(_CHUNK_SIZE)
+
+    data_type = _transaction_data_type(set(schema.names), c)
+    header = _columnar_header(filename, schema, c)
+
+    def _chunks() -> Iterator[list]:
+        for batch in batches:
+            yield [
+                batch.column(name)
+                .cast(pa.from_numpy_dtype(dtype))
+                .to_numpy(zero_copy_only=False)
+                if name in schema.names
+                else np.full(len(batch), np.nan)
+                for name, dtype in _column_dtypes(c).items()
+            ]
+
+    return header, data_type, _chunks()
+
+
+def _stream_rows(filename: Path, asset: str, chunks: Iterator[list]) -> Iterator[tuple]:
+    # NOTE: The columns of a chunk are converted and rounded like the loaded
+    # transactions (see `_frame_transactions` and `_round_columns`)
+    # before the chunk is split into rows.
+    last = None
+    for dates, *values in chunks:
+        dates = to_datetime(dates).to_numpy().astype("datetime64[D]")
+        if not len(dates):
+            continue
+        if (last is not None and dates[0] < last) or np.any(dates[1:] < dates[:-1]):
+            print(
+                f'ValueError: The transactions of "{filename}" aren\'t in '
+                "chronological order, which streaming requires"
+            )
+            raise SystemExit(1)
+        last = dates[-1]
+
+        amounts, prices, fx_rates = (
+            np.round(np.asarray(column, dtype=np.float64), decimals).tolist()
+            for column, decimals in zip(values, [6, 2, 2])
+        )
+        yield from zip(
+            dates.tolist(), itertools.repeat(asset), amounts, prices, fx_rates
         )
-        dfs.append(df)
 
-    df = concat(dfs).sort_index()
-    return df
+
+def stream_input_files(
+    input_files: list, c: Config
+) -> tuple[list[InputFile], Iterator[tuple]]:
+    """Returns the metadata of the input files and a stream of their transactions.
+
+    The transactions are read in chunks of `_CHUNK_SIZE` records (a record batch
+    of the columnar formats) and merged in chronological order like the loaded
+    transactions, so the memory doesn't grow with the number of transactions.
+    Every transaction is a tuple of the date, the asset, the amount, the price
+    and the FX rate, rounded like by `load_input_files`. Streaming requires the
+    market data in the input files, whose transactions are in chronological
+    order.
+    """
+    files, streams = [], []
+    for input_file in input_files:
+        filename = Path(c._DATA_PATH) / input_file
+        try:
+            if filename.suffix in _COLUMNAR_SUFFIXES:
+                header, data_type, chunks = _stream_columnar_file(filename, c)
+            else:
+                header, data_type, chunks = _stream_json_file(filename, c)
+        except FileNotFoundError:
+            print(f'ImportError: Input file "{filename}" doesn\'t exist')
+            raise SystemExit(1)
+
+        if data_type != c._COMPLETE:
+            print(
+                f'ValueError: Streaming requires "{c._PRICE}" and "{c._FX_RATE}" '
+                f'in the transactions of "{filename}"'
+            )
+            raise SystemExit(1)
+
+        asset = header[c._ASSET]
+        files.append(
+            InputFile(
+                filename=filename,
+                asset=asset,
+                asset_currency=header[c._ASSET_CURRENCY],
+                data_type=data_type,
+            )
+        )
+        streams.append(_stream_rows(filename, asset, chunks))
+
+    # NOTE: Like the stable sort of `load_input_files`, transactions on the
+    # same date keep the order of the input files.
+    return files, heapq.merge(*streams, key=itemgetter(0))
 
 
 def _transactions_as_records(df: DataFrame, c: Config) -> list[dict]:
@@ -164,3 +802,54 @@ def export_json(filename: str, df: DataFrame, c: Config) -> None:
             ensure_ascii=False,
             indent=4,
         )
+
+
+def save_checkpoint(filename: str, checkpoint: Checkpoint) -> None:
+    assets = list(checkpoint.state)
+    held_amounts = [held for held, _ in checkpoint.state.values()]
+    acquisition_prices = [price for _, price in checkpoint.state.values()]
+    # NOTE: The checkpoint is written next to `filename` and moved in place, so
+    # an interrupted run leaves the previous checkpoint (or none) behind.
+    tmp = Path(filename).with_name(f".{Path(filename).name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as fhandle:
+            np.savez(
+                fhandle,
+                rows=checkpoint.rows,
+                date=checkpoint.date.to_datetime64(),
+                digest=checkpoint.digest,
+                acquisition_prices=checkpoint.acquisition_prices,
+                assets=np.array(assets, dtype=str),
+                held_amounts=np.array(held_amounts, dtype=np.float64),
+                state_acquisition_prices=np.array(acquisition_prices, dtype=np.float64),
+            )
+        os.replace(tmp, filename)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def load_checkpoint(filename: str) -> Checkpoint | None:
+    # NOTE: Without a checkpoint the ledger is calculated from the beginning,
+    # and so it is with an unreadable checkpoint (e.g., a truncated file).
+    if not Path(filename).exists():
+        return None
+
+    try:
+        with np.load(filename, allow_pickle=False) as npz:
+            return Checkpoint(
+                rows=int(npz["rows"]),
+                date=Timestamp(npz["date"][()]),
+                digest=str(npz["digest"]),
+                acquisition_prices=npz["acquisition_prices"],
+                state={
+                    asset: (held, acquisition_price)
+                    for asset, held, acquisition_price in zip(
+                        npz["assets"].tolist(),
+                        npz["held_amounts"].tolist(),
+                        npz["state_acquisition_prices"].tolist(),
+                    )
+                },
+            )
+    except (EOFError, KeyError, OSError, ValueError, zipfile.BadZipFile):
+        return None
@@ -0,0 +1,111 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+
+from pandas import DataFrame, DatetimeIndex, Timestamp, read_csv, read_parquet
+
+from src.cit.config import Config
+
+YAHOO_FINANCE = "yahoo"
+
+
+class PriceProvider(ABC):
+    """Source of daily `Open` and `Close` prices indexed by date.
+
+    `fetch` returns the prices for the trading days in [`start_date`,
+    `end_date`) and an empty `DataFrame` when no prices are available.
+    Providers that are `remote` go through the market data cache.
+    """
+
+    remote: bool = False
+
+    @abstractmethod
+    def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> DataFrame:
+        ...
+
+
+class YahooFinanceProvider(PriceProvider):
+    remote = True
+
+    def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> DataFrame:
+        # NOTE: `yfinance` (and through it `requests`, `lxml`, etc.) takes a
+        # large part of the startup time, so it's imported only when the
+        # market data is downloaded.
+        import yfinance as yf
+
+        # NOTE: `yf.download` keeps the downloaded data in module-level state
+        # that is shared between calls, which isn't safe when the market data
+        # is fetched from several threads, `yf.Ticker` keeps it per ticker.
+        df = yf.Ticker(ticker).history(
+            start=start_date, end=end_date, auto_adjust=False
+        )
+        if not df.empty:
+            df.index = df.index.tz_localize(None)
+        return df
+
+
+class InMemoryProvider(PriceProvider):
+    """Serves prices from `DataFrame`s keyed by ticker (e.g., in tests)."""
+
+    def __init__(self, prices: dict[str, DataFrame]) -> None:
+        self.prices = prices
+
+    def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> DataFrame:
+        if ticker not in self.prices:
+            return DataFrame(columns=["Open", "Close"], index=DatetimeIndex([]))
+
+        df = self.prices[ticker]
+        return df.loc[
+            (df.index >= Timestamp(start_date)) & (df.index < Timestamp(end_date))
+        ]
+
+
+class LocalFilesProvider(InMemoryProvider):
+    """Serves prices from `<ticker>.csv` or `<ticker>.parquet` files in a directory.
+
+    A price file has a `Date` column and a `Close` column, and optionally an
+    `Open` column. Without the `Open` column the mid price is the `Close` price,
+    which suits daily rates such as the ones published by Riksbank.
+    """
+
+    _READERS = {".parquet": read_parquet, ".csv": read_csv}
+
+    def __init__(self, directory: str) -> None:
+        super().__init__({})
+        self.directory = Path(directory)
+
+    def _read(self, ticker: str) -> DataFrame:
+        for suffix, reader in self._READERS.items():
+            filename = self.directory / f"{ticker}{suffix}"
+            if filename.exists():
+                break
+        else:
+            print(
+                f'ImportError: Price file for "{ticker}" doesn\'t exist in '
+                f'"{self.directory}"'
+            )
+            raise SystemExit(1)
+
+        df = reader(filename).rename(columns=str.capitalize)
+        if "Open" not in df:
+            df["Open"] = df["Close"]
+        return (
+            df.astype({"Date": "datetime64[ns]"})
+            .set_index("Date")
+            .sort_index()
+            .loc[:, ["Open", "Close"]]
+        )
+
+    def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> DataFrame:
+        if ticker not in self.prices:
+            self.prices[ticker] = self._read(ticker)
+        return super().fetch(ticker, start_date, end_date)
+
+
+def get_price_provider(c: Config) -> PriceProvider:
+    if isinstance(c._PRICES, PriceProvider):
+        return c._PRICES
+    elif c._PRICES == YAHOO_FINANCE:
+        return YahooFinanceProvider()
+    else:
+        return LocalFilesProvider(c._PRICES)
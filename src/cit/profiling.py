@@ -0,0 +1,152 @@
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from time import perf_counter
+import tracemalloc
+from typing import ContextManager, Iterator
+
+# NOTE: The stages of a run in the order of the breakdown, stages that aren't
+# in the list follow them.
+STAGES = [
+    "load",
+    "schema check",
+    "price complement",
+    "acquisition prices",
+    "P&L",
+    "aggregation",
+    "formatting",
+]
+
+
+@dataclass
+class Stage:
+    """Wall time, rows and peak memory of every run of the stage `name`.
+
+    The time of a stage excludes the time of the stages that run inside it, so
+    the times of all the stages add up to the time spent in stages. The peak
+    memory is the most memory allocated on top of the memory at the start of a
+    run (traced with `tracemalloc`, only when the memory is profiled).
+    """
+
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    peak_memory: int | None = None
+
+
+class Profile:
+    def __init__(self, memory: bool) -> None:
+        self.memory = memory
+        self.stages: dict[str, Stage] = {}
+        # NOTE: Every running stage keeps the time spent in its inner stages
+        # and the highest traced memory of its inner stages.
+        self._running: list[list[float]] = []
+        self._start = perf_counter()
+        self.seconds = 0.0
+        if memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        record = self.stages.setdefault(name, Stage(name))
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._running:
+                self._running[-1][1] = max(self._running[-1][1], peak)
+            tracemalloc.reset_peak()
+        else:
+            current = 0
+        self._running.append([0.0, 0])
+
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = perf_counter() - start
+            inner_seconds, inner_peak = self._running.pop()
+            record.calls += 1
+            record.seconds += seconds - inner_seconds
+            if self._running:
+                self._running[-1][0] += seconds
+            if self.memory:
+                peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+                record.peak_memory = max(record.peak_memory or 0, peak - current)
+                if self._running:
+                    self._running[-1][1] = max(self._running[-1][1], peak)
+
+    def stop(self) -> None:
+        self.seconds = perf_counter() - self._start
+        if self.memory:
+            tracemalloc.stop()
+
+    def _ordered_stages(self) -> list[Stage]:
+        order = {name: i for i, name in enumerate(STAGES)}
+        return sorted(
+            self.stages.values(), key=lambda x: order.get(x.name, len(STAGES))
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "seconds": round(self.seconds, 6),
+            "stages": [
+                {**asdict(stage), "seconds": round(stage.seconds, 6)}
+                for stage in self._ordered_stages()
+            ],
+        }
+
+    def breakdown(self) -> str:
+        lines = [f"{'stage':<20}{'calls':>7}{'rows':>12}{'time (s)':>11}{'%':>7}"]
+        if self.memory:
+            lines[0] += f"{'peak (MiB)':>12}"
+
+        # NOTE: The time outside of the stages (e.g., choosing the columns and
+        # the titles of the reports) is shown as "other".
+        other = Stage("other", seconds=self.seconds)
+        for stage in [*self._ordered_stages(), other]:
+            if stage is not other:
+                other.seconds -= stage.seconds
+            rows = f"{stage.rows:,}" if stage.rows else "-"
+            line = (
+                f"{stage.name:<20}{stage.calls or '-':>7}{rows:>12}"
+                f"{stage.seconds:>11.3f}{100 * stage.seconds / self.seconds:>7.1f}"
+            )
+            if self.memory:
+                peak = stage.peak_memory
+                line += f"{peak / 2**20:>12.1f}" if peak is not None else f"{'-':>12}"
+            lines.append(line)
+        lines.append(f"{'total':<20}{'':>7}{'':>12}{self.seconds:>11.3f}{100:>7.1f}")
+        return "\n".join(lines)
+
+
+_profile: Profile | None = None
+
+# NOTE: Without a profile every stage enters the same empty context and the
+# rows recorded in it are thrown away.
+_DISABLED = nullcontext(Stage("disabled"))
+
+
+def stage(name: str) -> ContextManager[Stage]:
+    """Returns the context of running the stage `name` of the profile.
+
+    The rows processed by the stage are added to the `rows` of the yielded
+    `Stage`. Without an enabled profile this is a no-op.
+    """
+    if _profile is None:
+        return _DISABLED
+    return _profile.stage(name)
+
+
+def enable(memory: bool = False) -> Profile:
+    global _profile
+
+    _profile = Profile(memory=memory)
+    return _profile
+
+
+def disable() -> Profile | None:
+    global _profile
+
+    profile, _profile = _profile, None
+    if profile is not None:
+        profile.stop()
+    return profile
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import os
+from pathlib import Path
+import socket
+import socketserver
+from threading import Lock
+from typing import Callable, Hashable
+
+# NOTE: A handler takes the command-line arguments of a request and returns the
+# HTTP status, the content type and the body of the response.
+Handler = Callable[[list[str]], tuple[int, str, bytes]]
+
+
+class LRUCache:
+    """In-memory store of the `maxsize` most recently used values by key.
+
+    A value is loaded only when its key is missing, and the least recently used
+    value is dropped when the store is full.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, load: Callable[[], object]) -> object:
+        with self._lock:
+            if key in self._values:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+            self.misses += 1
+
+        value = load()
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def stats(self) -> str:
+        return (
+            f"ledger cache: {self.hits} hits, {self.misses} misses, "
+            f"{len(self)} of {self.maxsize} held"
+        )
+
+
+def file_key(filenames: list[Path]) -> tuple:
+    """Returns the key of the input files, which changes with any of the files.
+
+    A missing file has no key of its own, so loading it reports the error.
+    """
+    key = []
+    for filename in filenames:
+        path = Path(filename).resolve()
+        try:
+            stat = path.stat()
+        except OSError:
+            key.append((str(path), None, None))
+        else:
+            key.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(key)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Runs the command-line arguments in the JSON body of a POST request."""
+
+    server: "_Server"
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            argv = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            argv = None
+        if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+            status, content_type, body = (
+                400,
+                "text/plain; charset=utf-8",
+                b"The body must be a JSON list of command-line arguments\n",
+            )
+        else:
+            status, content_type, body = self.server.handler(argv)
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # NOTE: The client of a Unix socket has no address.
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class _Server(HTTPServer):
+    def __init__(self, address, handler: Handler) -> None:
+        self.handler = handler
+        super().__init__(address, _RequestHandler)
+
+
+class _UnixServer(_Server):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self) -> None:
+        # NOTE: `HTTPServer.server_bind` looks up the host name of the address,
+        # which a Unix socket doesn't have.
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.TCPServer.server_bind(self)
+        self.server_name, self.server_port = "unix", 0
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def make_server(address: str, handler: Handler) -> HTTPServer:
+    """Returns an HTTP server that responds to every request with `handler`.
+
+    `address` is either `host:port` or the path of a Unix socket. The requests
+    are handled one at a time, each in milliseconds once its ledger is cached.
+    """
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return _Server((host, int(port)), handler)
+    else:
+        return _UnixServer(address, handler)
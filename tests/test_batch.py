@@ -0,0 +1,158 @@
+import argparse
+import json
+from pathlib import Path
+import shutil
+import sys
+
+from pandas import read_csv
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+import cit
+from src.cit.config import Config
+
+
+# Default CIT configuration
+@pytest.fixture
+def configuration(monkeypatch):
+    config = Config()
+    monkeypatch.setattr(cit, "config", config, raising=False)
+    return config
+
+
+@pytest.fixture
+def clients(configuration, tmp_path):
+    c = configuration
+    source = tmp_path / "clients"
+    (source / "client-c").mkdir(parents=True)
+    shutil.copy(Path(c._DATA_PATH) / "test-1.json", source / "client-a.json")
+    shutil.copy(Path(c._DATA_PATH) / "test-4.json", source / "client-b.json")
+    shutil.copy(Path(c._DATA_PATH) / "test-6a.json", source / "client-c")
+    shutil.copy(Path(c._DATA_PATH) / "test-6b.json", source / "client-c")
+    return source
+
+
+def test_batch_clients(clients, tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"client-a": ["clients/client-a.json"]}))
+
+    assert cit._batch_clients(clients) == {
+        "client-a": [str(clients / "client-a.json")],
+        "client-b": [str(clients / "client-b.json")],
+        "client-c": [
+            str(clients / "client-c" / "test-6a.json"),
+            str(clients / "client-c" / "test-6b.json"),
+        ],
+    }
+    assert cit._batch_clients(manifest) == {
+        "client-a": [str(clients / "client-a.json")],
+    }
+
+
+def test_batch_clients_out_dir(clients, configuration):
+    c = configuration
+    out_dir = clients / "output"
+    out_dir.mkdir()
+    shutil.copy(Path(c._DATA_PATH) / "test-1.json", out_dir / cit._BATCH_INDEX)
+
+    assert "output" in cit._batch_clients(clients)
+    assert "output" not in cit._batch_clients(clients, str(out_dir))
+
+
+def test_batch(clients, configuration, tmp_path):
+    c = configuration
+    out_dir = tmp_path / "output"
+    args = argparse.Namespace(
+        SOURCE=str(clients),
+        reports=["summary", "tax-liability"],
+        out_dir=str(out_dir),
+        workers=2,
+        prices=c._PRICES,
+        year=2022,
+        td=c._DEDUCTIBLE,
+        exact=False,
+        ccy=True,
+        format="table",
+    )
+
+    with pytest.raises(SystemExit) as e:
+        cit.batch(args)
+
+    index = json.loads((out_dir / cit._BATCH_INDEX).read_text())
+    results = {result["client"]: result for result in index["results"]}
+
+    assert e.value.code == 1
+    assert (index["clients"], index["failed"]) == (3, 1)
+    assert results["client-a"]["transactions"] == 3
+    assert results["client-c"]["transactions"] == 6
+    assert "Unknown format of transaction data" in results["client-b"]["error"]
+    assert results["client-c"]["outputs"] == [str(out_dir / "client-c.txt")]
+    assert "TAX LIABILITY FOR 2022" in (out_dir / "client-c.txt").read_text()
+    assert not (out_dir / "client-b.txt").exists()
+
+
+def test_batch_csv(clients, configuration, tmp_path):
+    c = configuration
+    (clients / "client-b.json").unlink()
+    out_dir = tmp_path / "output"
+    args = argparse.Namespace(
+        SOURCE=str(clients),
+        reports=["profit-and-loss", "tax-liability"],
+        out_dir=str(out_dir),
+        workers=1,
+        prices=c._PRICES,
+        year=2022,
+        td=c._DEDUCTIBLE,
+        exact=False,
+        ccy=True,
+        format="csv",
+    )
+
+    cit.batch(args)
+
+    df = read_csv(out_dir / "client-c.tax-liability.csv")
+    assert sorted(path.name for path in out_dir.iterdir()) == [
+        "client-a.profit-and-loss.csv",
+        "client-a.tax-liability.csv",
+        "client-c.profit-and-loss.csv",
+        "client-c.tax-liability.csv",
+        cit._BATCH_INDEX,
+    ]
+    assert df.columns.tolist() == [
+        "Amount bought",
+        "Amount sold",
+        "Received (SEK)",
+        "Payed (SEK)",
+        "Taxable (SEK)",
+    ]
+
+
+def test_financial_years():
+    assert cit._financial_years("2021") == 2021
+    assert cit._financial_years("2021-2023") == [2021, 2022, 2023]
+    for value in ["2023-2021", "last"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            cit._financial_years(value)
+
+
+def test_forex_transactions_combined_out(configuration, tmp_path, capsys):
+    c = configuration
+    out = tmp_path / "forex.json"
+    args = argparse.Namespace(
+        FILES=["test-1.json"],
+        prices=c._PRICES,
+        out=str(out),
+        combined=True,
+        year=2022,
+        format="table",
+    )
+
+    with pytest.raises(SystemExit) as e:
+        cit.forex_transactions(args)
+
+    assert e.value.code == 1
+    assert capsys.readouterr().out.startswith("ValueError: --out writes only")
+    assert not out.exists()
@@ -0,0 +1,218 @@
+from datetime import date
+import json
+from pathlib import Path
+import sys
+
+from pandas import DataFrame, Timestamp, bdate_range
+from pandas.testing import assert_frame_equal
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+from src.cit import io
+from src.cit.cache import INPUT_CACHE_SUFFIX, MarketDataCache
+from src.cit.config import Config
+from src.cit.prices import PriceProvider
+
+
+class StubDownloader(PriceProvider):
+    """Returns made-up market data for business days and records the requests."""
+
+    remote = True
+
+    def __init__(self):
+        self.requests = []
+
+    def fetch(self, ticker, start_date, end_date):
+        self.requests.append((ticker, start_date, end_date))
+        days = bdate_range(start_date, end_date, inclusive="left")
+        return DataFrame(
+            {
+                "Open": [float(day.day) for day in days],
+                "Close": [float(day.day) + 1 for day in days],
+            },
+            index=days,
+        )
+
+
+class Offline(PriceProvider):
+    remote = True
+
+    def fetch(self, ticker, start_date, end_date):
+        raise AssertionError(f"unexpected download of {ticker}")
+
+
+def test_market_data_cache_fetches_missing_ranges(tmp_path):
+    cache = MarketDataCache(tmp_path)
+    fetch = StubDownloader()
+
+    df_first = cache.read("BTC-USD", date(2021, 10, 1), date(2021, 10, 11), fetch.fetch)
+    df_second = cache.read(
+        "BTC-USD", date(2021, 10, 1), date(2021, 10, 11), Offline().fetch
+    )
+    cache.read("BTC-USD", date(2021, 9, 28), date(2021, 10, 13), fetch.fetch)
+
+    assert_frame_equal(df_first, df_second)
+    assert df_first.index[0] == Timestamp("2021-10-01")
+    assert len(df_first) == 6  # no data for weekends
+    assert fetch.requests == [
+        ("BTC-USD", date(2021, 10, 1), date(2021, 10, 11)),
+        ("BTC-USD", date(2021, 9, 28), date(2021, 10, 1)),
+        ("BTC-USD", date(2021, 10, 11), date(2021, 10, 13)),
+    ]
+    assert (cache.hits, cache.misses) == (10 + 10, 10 + 5)
+
+
+def test_market_data_cache_skips_failed_downloads(tmp_path):
+    cache = MarketDataCache(tmp_path)
+
+    cache.read("FOO-USD", date(2021, 10, 1), date(2021, 10, 4), lambda *_: DataFrame())
+    fetch = StubDownloader()
+    df = cache.read("FOO-USD", date(2021, 10, 1), date(2021, 10, 4), fetch.fetch)
+
+    assert len(fetch.requests) == 1
+    assert df.index.tolist() == [Timestamp("2021-10-01")]
+
+
+def test_complement_basic_data_offline(tmp_path):
+    c = Config()
+    c._CACHE_PATH = str(tmp_path)
+
+    df = DataFrame(
+        {"amount": {Timestamp("2021-10-12"): 0.5, Timestamp("2021-10-18"): -0.4}}
+    )
+
+    c._PRICES = StubDownloader()
+    df_online = io.complement_basic_data("BTC-USD", "SEK", df, c)
+    c._PRICES = Offline()
+    df_offline = io.complement_basic_data("BTC-USD", "SEK", df, c)
+
+    assert_frame_equal(df_online, df_offline)
+    assert df_offline[c._PRICE].tolist() == [12.5, 18.5]
+
+
+def test_complement_basic_data_fetches_transaction_windows():
+    c = Config()
+    c._CACHE_PATH = ""
+
+    df = DataFrame(
+        {
+            "amount": {
+                Timestamp("2021-10-17"): 0.5,  # Sunday
+                Timestamp("2021-10-19"): 0.2,
+                Timestamp("2022-11-16"): -0.4,
+            }
+        }
+    )
+
+    fetch = StubDownloader()
+    c._PRICES = fetch
+    df_test_value = io.complement_basic_data("BTC-USD", "SEK", df, c)
+
+    assert [(s.date(), e.date()) for _, s, e in fetch.requests] == [
+        (date(2021, 10, 10), date(2021, 10, 20)),
+        (date(2022, 11, 9), date(2022, 11, 17)),
+    ] * 2
+    assert df_test_value[c._PRICE].tolist() == [15.5, 19.5, 16.5]
+
+
+def test_read_input_files_fetches_each_ticker_once(tmp_path):
+    c = Config()
+    c._DATA_PATH = str(tmp_path)
+    c._CACHE_PATH = ""
+    c._PRICES = StubDownloader()
+
+    for asset, amount in [("BTC-USD", 0.5), ("ETH-USD", 2.0)]:
+        (tmp_path / f"{asset}.json").write_text(
+            json.dumps(
+                {
+                    "Asset": asset,
+                    "AssetPriceCurrency": "USD",
+                    "Transactions": [
+                        {"date": "2021-10-12", "amount": amount},
+                        {"date": "2022-11-16", "amount": -amount},
+                    ],
+                }
+            )
+        )
+
+    df = io.read_input_files(["BTC-USD.json", "ETH-USD.json"], c)
+
+    assert sorted(ticker for ticker, _, _ in c._PRICES.requests) == [
+        "BTC-USD",
+        "BTC-USD",
+        "ETH-USD",
+        "ETH-USD",
+        "SEKUSD=X",
+        "SEKUSD=X",
+    ]
+    assert df[c._PRICE].tolist() == [12.5, 12.5, 16.5, 16.5]
+
+
+@pytest.mark.parametrize("filename", ["test-2.json", "test-3.json"])
+def test_read_transactions_file_from_input_cache(filename, tmp_path, monkeypatch):
+    c = Config()
+    c._INPUT_CACHE = True
+    filename = tmp_path / filename
+    filename.write_bytes((Path(c._DATA_PATH) / filename.name).read_bytes())
+
+    d, df, data_type = io.read_transactions_file(filename, c)
+
+    # The second read is memory-mapped from the cache without parsing the file
+    def _frame_transactions(*args):
+        raise AssertionError("unexpected parsing of the input file")
+
+    monkeypatch.setattr(io, "_frame_transactions", _frame_transactions)
+    d_cached, df_cached, data_type_cached = io.read_transactions_file(filename, c)
+
+    assert (d_cached, data_type_cached) == (d, data_type)
+    assert_frame_equal(df_cached, df)
+    assert len(list(tmp_path.glob(f"*{INPUT_CACHE_SUFFIX}/*"))) == 1
+
+    # A modified input file is parsed and cached again
+    monkeypatch.undo()
+    d_modified = json.loads(filename.read_text())
+    d_modified[c._TRANSACTIONS][0][c._AMOUNT] += 2
+    filename.write_text(json.dumps(d_modified))
+    df_modified = io.read_transactions_file(filename, c)[1]
+
+    assert_frame_equal(df_modified, io.read_transactions_file(filename, Config())[1])
+    assert df_modified[c._AMOUNT].tolist() != df[c._AMOUNT].tolist()
+    assert len(list(tmp_path.glob(f"*{INPUT_CACHE_SUFFIX}/*"))) == 1
+
+
+def test_load_input_files_from_input_cache(tmp_path):
+    c = Config()
+    c._DATA_PATH = str(tmp_path)
+    c._INPUT_CACHE = True
+    d = json.loads((root_path / "tests" / "input_data" / "test-1.json").read_text())
+    d[c._TRANSACTIONS][0][c._AMOUNT] = 0.12345678
+    (tmp_path / "test-1.json").write_text(json.dumps(d))
+
+    df = io.read_input_files(["test-1.json"], c)
+    df_cached = io.read_input_files(["test-1.json"], c)
+
+    # The cached columns are rounded and used without copying
+    assert_frame_equal(df_cached, df)
+    assert df_cached[c._AMOUNT].tolist() == [0.123457, 0.2, -0.4]
+    assert not df_cached[c._AMOUNT].to_numpy().flags.writeable
+
+
+def test_complement_basic_data_failed_download(tmp_path, capsys):
+    c = Config()
+    c._CACHE_PATH = str(tmp_path)
+    c._PRICES = StubDownloader()
+
+    # No market data on weekends and a lookback that doesn't reach Friday
+    c._PRICE_LOOKBACK_DAYS = 0
+    df = DataFrame(
+        {"amount": {Timestamp("2021-10-15"): 0.5, Timestamp("2021-10-17"): -0.4}}
+    )
+
+    with pytest.raises(SystemExit) as e:
+        io.complement_basic_data("BTC-USD", "SEK", df, c)
+
+    assert e.value.code == 1
+    assert "2021-10-17" in capsys.readouterr().out
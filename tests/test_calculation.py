@@ -0,0 +1,514 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+from pandas import concat, DataFrame, date_range, DatetimeIndex, Series, Timestamp
+from pandas.testing import assert_frame_equal
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+import src.cit.calculation
+from src.cit.calculation import (
+    build_ledger,
+    calculate_acquisition_prices,
+    calculate_forex_transactions,
+    calculate_PNL,
+    calculate_PNL_for_years,
+    calculate_PNL_per_year,
+    calculate_skatteverket,
+    calculate_skatteverket_for_years,
+    calculate_statistics,
+    calculate_statistics_at,
+    calculate_statistics_for_years,
+    combine_forex_transactions,
+    create_checkpoint,
+    iter_PNL,
+)
+from src.cit.config import Config
+from src.cit.io import (
+    load_checkpoint,
+    read_in_transactions,
+    read_input_files,
+    save_checkpoint,
+)
+from src.cit.prices import InMemoryProvider
+
+
+# Default CIT configuration
+@pytest.fixture
+def configuration():
+    config = Config()
+    return config
+
+
+def _iterrows_acquisition_prices(df: DataFrame, c: Config) -> DataFrame:
+    # NOTE: Reference implementation of the average cost method that walks the
+    # transactions row by row.
+    acquisition_prices = []
+    for i, (_, transaction) in enumerate(df.iterrows()):
+        cost = np.sign(transaction[c._AMOUNT]) * transaction[c._PRICE]
+        amount = transaction[c._AMOUNT]
+        if i == 0:
+            acquisition_price = cost
+            acquisition_amount = amount
+        else:
+            previous_acquisition_amount = acquisition_amount
+            acquisition_amount = previous_acquisition_amount + amount
+            if cost >= 0 and acquisition_amount == 0:
+                if amount > 0:
+                    acquisition_price = cost
+            elif cost >= 0:
+                acquisition_price = np.average(
+                    [acquisition_price, cost],
+                    weights=[previous_acquisition_amount, amount],
+                )
+        acquisition_prices.append(acquisition_price)
+
+    return df.assign(**{c._ACQUISITION_PRICE: acquisition_prices})
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "test-1.json",
+        "test-2.json",
+        "test-3.json",
+        "test-6a.json",
+        "test-6b.json",
+    ],
+)
+def test_calculate_acquisition_prices(filename, configuration):
+    c = configuration
+    c._INPUT_FILE = filename
+    # NOTE: Market data of the basic input file is served offline.
+    c._PRICES = InMemoryProvider(
+        {
+            "BTC-USD": DataFrame(
+                {
+                    "Open": [56000.0, 64000.0, 16500.0],
+                    "Close": [57000.0, 65000.0, 17000.0],
+                },
+                index=DatetimeIndex(["2021-10-12", "2021-11-12", "2022-11-16"]),
+            ),
+            "SEKUSD=X": DataFrame(
+                {"Open": [0.125, 0.125, 0.1], "Close": [0.125, 0.125, 0.1]},
+                index=DatetimeIndex(["2021-10-12", "2021-11-12", "2022-11-16"]),
+            ),
+        }
+    )
+    df = read_in_transactions(c)
+
+    df_test_value = calculate_acquisition_prices(df, c)
+    df_assert_value = _iterrows_acquisition_prices(df, c)
+
+    assert_frame_equal(df_test_value, df_assert_value)
+
+
+@pytest.mark.parametrize("filename", ["test-4.json", "test-5.json"])
+def test_calculate_acquisition_prices_system_exit(filename, configuration):
+    c = configuration
+    c._INPUT_FILE = filename
+
+    with pytest.raises(SystemExit) as e:
+        calculate_acquisition_prices(read_in_transactions(c), c)
+
+    assert e.value.code == 1
+
+
+def test_calculate_acquisition_prices_without_held_amount(configuration):
+    c = configuration
+
+    df = DataFrame(
+        {
+            c._AMOUNT: [10.0, -15.0, 5.0, 0.0, 2.0],
+            c._PRICE: [1000.0, 4000.0, 5000.0, 6000.0, 3000.0],
+            c._FX_RATE: [1.0, 1.0, 1.0, 1.0, 1.0],
+        },
+        index=date_range("2022-01-01", periods=5),
+    )
+
+    test_value = calculate_acquisition_prices(df, c)[c._ACQUISITION_PRICE]
+    assert_value = Series([1000.0, 1000.0, 5000.0, 5000.0, 3000.0], index=df.index)
+
+    np.testing.assert_allclose(test_value, assert_value)
+
+
+def test_calculate_acquisition_prices_repeated_transaction(configuration):
+    c = configuration
+
+    transaction = {"amount": 1.0, "market price": 100.0, "exchange rate": 1.0}
+    df = DataFrame(
+        [transaction, {**transaction, "market price": 200.0}, transaction],
+        index=[
+            Timestamp("2021-01-01"),
+            Timestamp("2021-01-01"),
+            Timestamp("2021-01-01"),
+        ],
+    )
+
+    test_value = calculate_acquisition_prices(df, c)[c._ACQUISITION_PRICE]
+    assert_value = Series([100.0, 150.0, 400.0 / 3], index=df.index)
+
+    np.testing.assert_allclose(test_value, assert_value)
+
+
+def test_build_ledger(configuration):
+    c = configuration
+    c._INPUT_FILE = "test-1.json"
+
+    df_test_value = build_ledger(read_in_transactions(c), c).transactions
+    df_assert_value = DataFrame(
+        {
+            "amount": [0.5, 0.2, -0.4],
+            "market price": [40000.0, 50000.0, 100000.0],
+            "exchange rate": [1.0, 1.0, 1.0],
+            "acquisition price": [40000.0, 300000.0 / 7, 300000.0 / 7],
+            "held amount": [0.5, 0.7, 0.3],
+            "P&L": [np.nan, np.nan, 0.4 * (100000.0 - 300000.0 / 7)],
+            "domestic P&L": [np.nan, np.nan, 0.4 * (100000.0 - 300000.0 / 7)],
+        },
+        index=df_test_value.index,
+    )
+
+    assert_frame_equal(df_test_value, df_assert_value)
+
+
+def test_build_ledger_positions(configuration):
+    c = configuration
+    df = DataFrame(
+        {
+            "amount": [1.0, -0.5, 2.0, -1.0, 0.5, -0.25],
+            "market price": 100.0,
+            "exchange rate": 1.0,
+        },
+        index=[
+            Timestamp(d)
+            for d in [
+                "2018-03-01",
+                "2018-12-31",
+                "2020-01-01",
+                "2020-06-01",
+                "2021-01-01",
+                "2021-12-31",
+            ]
+        ],
+    ).rename_axis(c._DATE)
+
+    ledger = build_ledger(df, c)
+
+    assert ledger.years == range(2018, 2022)
+    assert ledger.year_offsets.tolist() == [0, 2, 2, 4, 6]
+    assert ledger.buys.tolist() == [0, 2, 4]
+    assert ledger.sells.tolist() == [1, 3, 5]
+    for years in [[2017], [2018], [2019], [2020, 2021], [2018, 2021], [2022]]:
+        sells = calculate_PNL_for_years(years, ledger, c, ccy=True)
+        assert sells.index.tolist() == [
+            d.date() for d in df.index[(df["amount"] < 0) & df.index.year.isin(years)]
+        ]
+
+
+def test_ledger_snapshots(configuration):
+    c = configuration
+    df = read_input_files(["test-2.json"], c)
+    ledger = build_ledger(df, c)
+    years = [2020, 2021, 2022, 2023]
+
+    df_snapshots = ledger.snapshots.loc["BTC-SEK"]
+    df_statistics = calculate_statistics_for_years(years, ledger, c, ccy=False)
+    df_year_ends = calculate_statistics_at(
+        [Timestamp(year, 12, 31) for year in years], ledger, c, ccy=False
+    )
+
+    assert df_snapshots.index.tolist() == [2021, 2022]
+    np.testing.assert_allclose(df_snapshots["Remaining"], [20.0, 4.655])
+    assert_frame_equal(
+        df_year_ends.drop(columns="Date"), df_statistics.drop(columns="Year")
+    )
+    assert df_statistics["Remaining"].tolist() == [0.0, 20.0, 4.655, 4.655]
+    # NOTE: A snapshot includes the transactions on its date.
+    df_at = calculate_statistics_at(
+        [Timestamp("2022-01-31"), Timestamp("2022-02-01")], ledger, c, ccy=False
+    )
+    assert df_at["Amount sold"].tolist() == [0.0, -15.0]
+
+
+def test_calculate_statistics_with_missing_prices(configuration):
+    c = configuration
+    df = DataFrame(
+        {"amount": [2.0, -1.0], "market price": [1500.0, 1800.0]},
+        index=[Timestamp("2022-03-01"), Timestamp("2022-06-01")],
+    ).rename_axis(c._DATE)
+    df[c._FX_RATE] = np.nan
+    ledger = build_ledger(df, c)
+
+    df_statistics = calculate_statistics_for_years([2021, 2022], ledger, c, ccy=False)
+
+    # Only the year before the first transaction has no position
+    assert df_statistics["Remaining"].tolist() == [0.0, 1.0]
+    assert df_statistics["Average buying price"].iloc[0] == 0.0
+    assert np.isnan(df_statistics["Average buying price"].iloc[1])
+
+
+@pytest.fixture
+def folded_amounts(monkeypatch):
+    amounts = []
+    average_cost = src.cit.calculation._average_cost
+
+    def _average_cost(*args):
+        amounts.extend(args[0])
+        return average_cost(*args)
+
+    monkeypatch.setattr(src.cit.calculation, "_average_cost", _average_cost)
+    return amounts
+
+
+def test_build_ledger_from_checkpoint(configuration, folded_amounts, tmp_path):
+    c = configuration
+    df = read_input_files(["test-2.json"], c)
+    filename = tmp_path / "checkpoint.npz"
+
+    save_checkpoint(filename, create_checkpoint(build_ledger(df.iloc[:4], c), c))
+    folded_amounts.clear()
+    ledger = build_ledger(df, c, checkpoint=load_checkpoint(filename))
+
+    assert folded_amounts == df[c._AMOUNT].iloc[4:].tolist()
+    assert_frame_equal(ledger.transactions, build_ledger(df, c).transactions)
+
+
+def test_load_checkpoint_truncated(configuration, tmp_path):
+    c = configuration
+    df = read_input_files(["test-2.json"], c)
+    filename = tmp_path / "checkpoint.npz"
+
+    save_checkpoint(filename, create_checkpoint(build_ledger(df.iloc[:4], c), c))
+    save_checkpoint(filename, create_checkpoint(build_ledger(df, c), c))
+    assert load_checkpoint(filename).rows == len(df)
+    assert list(tmp_path.iterdir()) == [filename]
+
+    # An unreadable checkpoint is no checkpoint
+    content = filename.read_bytes()
+    for truncated in [content[: len(content) // 2], b""]:
+        filename.write_bytes(truncated)
+        assert load_checkpoint(filename) is None
+
+
+def test_build_ledger_from_outdated_checkpoint(configuration, folded_amounts):
+    c = configuration
+    df = read_input_files(["test-2.json"], c)
+
+    checkpoint = create_checkpoint(build_ledger(df.iloc[:4], c), c)
+    df.iloc[1, df.columns.get_loc(c._PRICE)] = 6000.0
+    folded_amounts.clear()
+    ledger = build_ledger(df, c, checkpoint=checkpoint)
+
+    assert folded_amounts == df[c._AMOUNT].tolist()
+    assert_frame_equal(ledger.transactions, build_ledger(df, c).transactions)
+
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_build_ledger_from_checkpoint_of_other_arithmetic(exact, configuration):
+    c = configuration
+    # The acquisition price of 100.666... differs in the last digits
+    df = DataFrame(
+        {
+            "amount": [1.0, 1.0, 1.0, -1.0, 1.0],
+            "market price": [100.0, 101.0, 101.0, 120.0, 110.0],
+            "exchange rate": 10.0,
+        },
+        index=date_range("2022-01-01", periods=5),
+    ).rename_axis(c._DATE)
+
+    c._EXACT = not exact
+    checkpoint = create_checkpoint(build_ledger(df.iloc[:4], c), c)
+    c._EXACT = exact
+    ledger = build_ledger(df, c, checkpoint=checkpoint)
+
+    assert_frame_equal(
+        ledger.transactions, build_ledger(df, c).transactions, check_exact=True
+    )
+
+
+def test_calculate_reports_from_ledger(configuration):
+    c = configuration
+    c._INPUT_FILE = "test-2.json"
+    ledger = build_ledger(read_in_transactions(c), c)
+
+    df_statistics = calculate_statistics(2022, ledger, c, ccy=True)
+    df_pnl = calculate_PNL_per_year(2022, ledger, c, ccy=True)
+    df_skatteverket = calculate_skatteverket(2022, ledger, c, ccy=True)
+
+    assert df_statistics.to_dict(orient="records") == [
+        {
+            "Amount bought": 25.0,
+            "Amount sold": -20.345,
+            "Remaining": 4.655,
+            "Average buying price": 4000.0,
+        }
+    ]
+    assert df_pnl[c._PNL].round(2).tolist() == [15000.0, 620.0, -5000.0]
+    assert df_skatteverket.to_dict(orient="records") == [
+        {
+            "Amount bought": 5.0,
+            "Amount sold": -20.345,
+            "Received": 77000.0,
+            "Payed": -66380.0,
+            "Taxable": 12120.0,
+        }
+    ]
+
+
+def test_calculate_reports_for_years(configuration):
+    c = configuration
+    c._INPUT_FILE = "test-2.json"
+    ledger = build_ledger(read_in_transactions(c), c)
+    years = [2020, 2021, 2022, 2023]
+
+    df_statistics = calculate_statistics_for_years(years, ledger, c, ccy=True)
+    df_skatteverket = calculate_skatteverket_for_years(years, ledger, c, ccy=True)
+
+    for i, year in enumerate(years):
+        assert_frame_equal(
+            df_statistics.iloc[[i]].drop(columns="Year").reset_index(drop=True),
+            calculate_statistics(year, ledger, c, ccy=True),
+        )
+        assert_frame_equal(
+            df_skatteverket.iloc[[i]].drop(columns="Year").reset_index(drop=True),
+            calculate_skatteverket(year, ledger, c, ccy=True),
+        )
+    assert df_statistics["Year"].tolist() == years
+    assert df_skatteverket["Taxable"].tolist() == [0.0, 0.0, 12120.0, 0.0]
+
+
+def test_calculate_reports_per_asset(configuration):
+    c = configuration
+    df_btc = read_input_files(["test-2.json"], c)
+    df_eth = DataFrame(
+        {
+            "amount": [2.0, -1.0],
+            "market price": [1500.0, 1800.0],
+            "exchange rate": [8.5, 10.0],
+            "Asset": "ETH-USD",
+            "AssetPriceCurrency": "USD",
+        },
+        index=[Timestamp("2021-03-01"), Timestamp("2022-06-01")],
+    ).rename_axis(c._DATE)
+    ledger = build_ledger(concat([df_btc, df_eth]).sort_index(), c)
+    ledger_btc = build_ledger(df_btc, c)
+
+    df_ledger = ledger.transactions
+    df_pnl = calculate_PNL_per_year(2022, ledger, c, ccy=False)
+    df_skatteverket = calculate_skatteverket(2022, ledger, c, ccy=False)
+
+    assert ledger.assets == ["BTC-SEK", "ETH-USD"]
+    assert_frame_equal(
+        df_ledger.loc[df_ledger["Asset"] == "BTC-SEK"],
+        ledger_btc.transactions.astype({"Asset": str, "AssetPriceCurrency": str}),
+        check_dtype=False,
+    )
+    assert df_pnl["Asset"].tolist() == ["BTC-SEK", "ETH-USD", "BTC-SEK", "BTC-SEK"]
+    assert_frame_equal(
+        df_skatteverket,
+        DataFrame(
+            {
+                "Asset": ["BTC-SEK", "ETH-USD", "Portfolio"],
+                "Amount bought": [5.0, 0.0, np.nan],
+                "Amount sold": [-20.345, -1.0, np.nan],
+                "Received": [77000.0, 18000.0, 95000.0],
+                "Payed": [-66380.0, -15000.0, -81380.0],
+                "Taxable": [12120.0, 3000.0, 15120.0],
+            }
+        ),
+    )
+
+
+def test_calculate_PNL_of_assets_sharing_dates(configuration):
+    c = configuration
+    index = [Timestamp("2022-01-01"), Timestamp("2022-06-01")]
+    df = concat(
+        [
+            DataFrame(
+                {
+                    "amount": [2.0, -1.0],
+                    "market price": [100.0, price],
+                    "exchange rate": 10.0,
+                    "Asset": asset,
+                    "AssetPriceCurrency": "USD",
+                },
+                index=index,
+            )
+            for asset, price in [("BTC-USD", 150.0), ("ETH-USD", 80.0)]
+        ]
+    ).rename_axis(c._DATE)
+    ledger = build_ledger(df.sort_index(kind="stable"), c)
+
+    df_pnl = calculate_PNL(ledger, c, ccy=False)
+
+    assert df_pnl["Asset"].tolist() == ["BTC-USD", "ETH-USD"]
+    assert df_pnl["P&L"].tolist() == [500.0, -200.0]
+
+
+@pytest.mark.parametrize("ccy", [True, False])
+@pytest.mark.parametrize("years", [None, [2021], [2022]])
+def test_iter_PNL(ccy, years, configuration):
+    c = configuration
+    df = read_input_files(["test-1.json", "test-2.json"], c)
+    ledger = build_ledger(df, c)
+    transactions = zip(
+        df.index.date, df[c._ASSET], df[c._AMOUNT], df[c._PRICE], df[c._FX_RATE]
+    )
+
+    records = iter_PNL(transactions, ccy=ccy, financial_years=years)
+    df_pnl = calculate_PNL_for_years(years or ledger.years, ledger, c, ccy=ccy)
+
+    # The P&L of a single asset is reported without the asset
+    records = [record[:1] + record[2:] for record in records]
+    assert records == list(zip(df_pnl.index, *df_pnl.to_dict(orient="list").values()))
+
+
+def test_combine_forex_transactions(configuration):
+    c = configuration
+    df_btc = read_input_files(["test-2.json"], c)
+    df_usd = DataFrame(
+        {
+            "amount": [2.0, 1.0, -0.5, -1.0],
+            "market price": [1500.0, 20000.0, 30000.0, 1800.0],
+            "exchange rate": [8.5, 9.0, 9.5, 10.0],
+            "Asset": ["ETH-USD", "BTC-USD", "BTC-USD", "ETH-USD"],
+            "AssetPriceCurrency": "USD",
+        },
+        index=[
+            Timestamp(d)
+            for d in ["2021-03-01", "2021-09-01", "2022-02-01", "2022-06-01"]
+        ],
+    ).rename_axis(c._DATE)
+    df = concat([df_btc, df_usd]).sort_index(kind="stable")
+
+    df_combined = combine_forex_transactions(df, c)
+    ledger = build_ledger(df_combined, c)
+    df_skatteverket = calculate_skatteverket(2022, ledger, c, ccy=False)
+
+    # NOTE: The FX transactions of both USD assets are one asset, which is the
+    # same as calculating the FX transactions in a separate run.
+    df_forex = calculate_forex_transactions(df_usd, c)
+    df_forex_separate = calculate_skatteverket(
+        2022, build_ledger(df_forex, c), c, False
+    )
+    assert ledger.assets == ["BTC-SEK", "BTC-USD", "ETH-USD", "USD"]
+    assert_frame_equal(
+        df_combined.loc[df_combined["Asset"] == "USD", df_forex.columns],
+        df_forex,
+        check_dtype=False,
+    )
+    assert_frame_equal(
+        df_skatteverket.loc[df_skatteverket["Asset"] == "USD"]
+        .drop(columns="Asset")
+        .reset_index(drop=True),
+        df_forex_separate,
+    )
+    assert_frame_equal(
+        df_skatteverket.iloc[:3],
+        calculate_skatteverket(2022, build_ledger(df, c), c, ccy=False).iloc[:3],
+    )
@@ -1,4 +1,5 @@
 from datetime import datetime
+import json
 from pathlib import Path
 import sys
 
@@ -15,10 +16,16 @@ from src.cit.io import (
     check_transaction_data_type,
     complement_basic_data,
     compute_mid_prices,
+    InputFile,
+    load_input_files,
+    read_json,
     read_in_transactions,
     read_input_files,
     read_json_with_config,
+    read_transactions_file,
+    stream_input_files,
 )
+import src.cit.io
 
 
 # Default CIT configuration
@@ -117,6 +124,153 @@ def test_check_transaction_data_type_system_exit(filename, configuration):
     assert e.value.code == 1
 
 
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "test-1.json",
+        "test-2.json",
+        "test-3.json",
+    ],
+)
+def test_read_transactions_file(filename, configuration, monkeypatch):
+    pytest.importorskip("ijson")
+    c = configuration
+    filename = Path(c._DATA_PATH) / filename
+
+    header, df_test_value, data_type = read_transactions_file(filename, c)
+
+    # Without `ijson` the whole file is loaded before framing the transactions
+    monkeypatch.setattr(src.cit.io, "ijson", None)
+    d = read_json(filename)
+    transactions = d.pop(c._TRANSACTIONS)
+    df_assert_value = DataFrame(transactions).astype({c._DATE: "datetime64[ns]"})
+    df_assert_value = df_assert_value.set_index(c._DATE).sort_index().astype(float)
+
+    assert header == {c._ASSET: d[c._ASSET], c._ASSET_CURRENCY: d[c._ASSET_CURRENCY]}
+    assert data_type == check_transaction_data_type(transactions, c)
+    assert_frame_equal(df_test_value, df_assert_value)
+    assert read_transactions_file(filename, c)[0] == d
+    assert_frame_equal(read_transactions_file(filename, c)[1], df_test_value)
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "test-4.json",
+        "test-5.json",
+        "file-that-does-not-exist.json",
+    ],
+)
+def test_read_transactions_file_system_exit(filename, configuration):
+    c = configuration
+
+    with pytest.raises(SystemExit) as e:
+        read_transactions_file(Path(c._DATA_PATH) / filename, c)
+
+    assert e.value.code == 1
+
+
+def _write_columnar_file(filename, d, c):
+    pa = pytest.importorskip("pyarrow")
+    from pyarrow import feather, parquet
+
+    table = pa.Table.from_pylist(d[c._TRANSACTIONS])
+    if filename.suffix == ".csv":
+        table.to_pandas().to_csv(filename, index=False)
+        with open(filename.with_suffix(".meta.json"), "w") as fhandle:
+            json.dump(
+                {c._ASSET: d[c._ASSET], c._ASSET_CURRENCY: d[c._ASSET_CURRENCY]},
+                fhandle,
+            )
+        return
+
+    table = table.replace_schema_metadata(
+        {c._ASSET: d[c._ASSET], c._ASSET_CURRENCY: d[c._ASSET_CURRENCY]}
+    )
+    if filename.suffix == ".feather":
+        feather.write_feather(table, filename)
+    else:
+        parquet.write_table(table, filename)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather", ".csv"])
+@pytest.mark.parametrize("filename", ["test-1.json", "test-3.json"])
+def test_read_columnar_transactions_file(filename, suffix, configuration, tmp_path):
+    c = configuration
+    filename = Path(c._DATA_PATH) / filename
+    d = read_json(filename)
+    columnar_filename = (tmp_path / filename.name).with_suffix(suffix)
+    _write_columnar_file(columnar_filename, d, c)
+
+    header, df_test_value, data_type = read_transactions_file(columnar_filename, c)
+    _, df_assert_value, assert_data_type = read_transactions_file(filename, c)
+
+    assert header == {c._ASSET: d[c._ASSET], c._ASSET_CURRENCY: d[c._ASSET_CURRENCY]}
+    assert data_type == assert_data_type
+    assert_frame_equal(df_test_value, df_assert_value)
+
+
+def test_read_columnar_transactions_file_system_exit(configuration, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    from pyarrow import parquet
+
+    c = configuration
+    filename = tmp_path / "test-1.parquet"
+    d = read_json(Path(c._DATA_PATH) / "test-1.json")
+    parquet.write_table(pa.Table.from_pylist(d[c._TRANSACTIONS]), filename)
+
+    with pytest.raises(SystemExit) as e:
+        read_transactions_file(filename, c)
+
+    assert e.value.code == 1
+
+
+@pytest.mark.parametrize("suffix", [".json", ".parquet", ".feather", ".csv"])
+def test_stream_input_files(suffix, configuration, tmp_path, monkeypatch):
+    c = configuration
+    # Streaming requires input files in chronological order
+    input_files = []
+    for filename in ["test-1.json", "test-2.json"]:
+        d = read_json(Path(c._DATA_PATH) / filename)
+        d[c._TRANSACTIONS].sort(key=lambda transaction: transaction[c._DATE])
+        filename = (tmp_path / filename).with_suffix(suffix)
+        if suffix == ".json":
+            filename.write_text(json.dumps(d))
+        else:
+            _write_columnar_file(filename, d, c)
+        input_files.append(filename)
+    monkeypatch.setattr(src.cit.io, "_CHUNK_SIZE", 2)
+
+    files, transactions = stream_input_files(input_files, c)
+    dataset = load_input_files(input_files, c)
+
+    df = dataset.transactions
+    assert files == dataset.files
+    assert list(transactions) == list(
+        zip(
+            df.index.date,
+            df[c._ASSET],
+            df[c._AMOUNT],
+            df[c._PRICE],
+            df[c._FX_RATE],
+        )
+    )
+
+
+def test_stream_input_files_system_exit(configuration, tmp_path):
+    c = configuration
+    d = read_json(Path(c._DATA_PATH) / "test-1.json")
+    d[c._TRANSACTIONS].reverse()
+    filename = tmp_path / "test-1.json"
+    filename.write_text(json.dumps(d))
+
+    _, transactions = stream_input_files([filename], c)
+    with pytest.raises(SystemExit) as e:
+        list(transactions)
+
+    assert e.value.code == 1
+
+
 def test_compute_mid_prices():
     df = (
         DataFrame(
@@ -151,8 +305,9 @@ def test_compute_mid_prices():
     assert_frame_equal(df_test_value, df_assert_value)
 
 
-def test_read_in_transactions_basic(configuration):
+def test_read_in_transactions_basic(configuration, tmp_path):
     c = configuration
+    c._CACHE_PATH = str(tmp_path)
     c._INPUT_FILE = "test-3.json"
 
     df_test_value = read_in_transactions(c)
@@ -198,9 +353,9 @@ def test_read_in_transactions_complete(configuration):
                 Timestamp("2022-11-16 00:00:00"): 100000.00,
             },
             "exchange rate": {
-                Timestamp("2021-10-12 00:00:00"): 1,
-                Timestamp("2021-11-12 00:00:00"): 1,
-                Timestamp("2022-11-16 00:00:00"): 1,
+                Timestamp("2021-10-12 00:00:00"): 1.0,
+                Timestamp("2021-11-12 00:00:00"): 1.0,
+                Timestamp("2022-11-16 00:00:00"): 1.0,
             },
         }
     )
@@ -209,8 +364,9 @@ def test_read_in_transactions_complete(configuration):
     assert_frame_equal(df_test_value, df_assert_value)
 
 
-def test_complement_basic_data(configuration):
+def test_complement_basic_data(configuration, tmp_path):
     c = configuration
+    c._CACHE_PATH = str(tmp_path)
 
     asset = "BTC-USD"
     currency = "SEK"
@@ -256,6 +412,35 @@ def test_read_input_files(configuration):
     df_test_value = read_input_files(input_files, c)
 
     c._INPUT_FILE = "test-2.json"
-    df_assert_value = read_in_transactions(c)
+    df_assert_value = (
+        read_in_transactions(c)
+        .assign(Asset="BTC-SEK", AssetPriceCurrency="SEK")
+        .astype({"Asset": "category", "AssetPriceCurrency": "category"})
+    )
 
     assert_frame_equal(df_test_value, df_assert_value)
+
+
+def test_load_input_files(configuration):
+    c = configuration
+    input_file = c._INPUT_FILE
+
+    input_files = ["test-1.json", "test-6a.json"]
+    dataset = load_input_files(input_files, c)
+
+    assert c._INPUT_FILE == input_file
+    assert_frame_equal(dataset.transactions, read_input_files(input_files, c))
+    assert dataset.files == [
+        InputFile(
+            filename=Path(c._DATA_PATH) / "test-1.json",
+            asset="BTC-SEK",
+            asset_currency="SEK",
+            data_type=c._COMPLETE,
+        ),
+        InputFile(
+            filename=Path(c._DATA_PATH) / "test-6a.json",
+            asset="BTC-SEK",
+            asset_currency="SEK",
+            data_type=c._COMPLETE,
+        ),
+    ]
@@ -0,0 +1,106 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+from pandas import DataFrame, date_range
+from pandas.testing import assert_frame_equal
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+from src.cit import exact
+from src.cit.calculation import (
+    build_ledger,
+    calculate_skatteverket,
+    calculate_statistics,
+)
+from src.cit.config import Config
+from src.cit.io import read_input_files
+
+
+# Default CIT configuration
+@pytest.fixture
+def configuration():
+    config = Config()
+    return config
+
+
+def test_div_round():
+    n = np.array([5, 15, 25, -5, -15, 14, 16, -14])
+
+    assert exact.div_round(n, 10).tolist() == [0, 2, 2, 0, -2, 1, 2, -1]
+    assert [exact.div_round_int(int(x), 10) for x in n] == [0, 2, 2, 0, -2, 1, 2, -1]
+    assert exact.div_round_int(5, -10) == 0
+
+
+def test_sales():
+    # NOTE: 12 345 678.9 units at 1.23 each overflow the product in micro-units.
+    proceeds, _ = exact.sales(
+        np.array([-12_345_678_900_000]),
+        np.array([1_230_000]),
+        np.array([0]),
+        np.array([100]),
+    )
+    assert proceeds.tolist() == [1_518_518_505]
+
+    # NOTE: Selling 0.345 units at 5797.10 for 4000.00 each at the rate 10.50,
+    # the proceeds 1999.9995 are rounded before the conversion.
+    proceeds, cost = exact.sales(
+        np.array([-345_000]),
+        np.array([5_797_100_000]),
+        np.array([4_000_000_000]),
+        np.array([1050]),
+    )
+
+    assert proceeds.tolist() == [2_099_999]
+    assert cost.tolist() == [1_449_000]
+    assert exact.deduct(cost - proceeds, 0.7).tolist() == [-455_699]
+
+
+@pytest.mark.parametrize(
+    "filename", ["skatteverket-example-1.json", "skatteverket-example-2.json"]
+)
+def test_exact_reports(filename, configuration):
+    c = configuration
+    c._DATA_PATH = str(root_path / "input_data")
+    df = read_input_files([filename], c)
+    c_exact = Config(_DATA_PATH=c._DATA_PATH, _EXACT=True)
+
+    ledger, ledger_exact = build_ledger(df, c), build_ledger(df, c_exact)
+
+    for calculate in [calculate_skatteverket, calculate_statistics]:
+        assert_frame_equal(
+            calculate(2022, ledger_exact, c_exact, ccy=False),
+            calculate(2022, ledger, c, ccy=False),
+        )
+
+
+def test_exact_partial_sells(configuration):
+    c = configuration
+    n = 4_000
+    df = DataFrame(
+        {
+            "amount": np.where(np.arange(n) % 4 == 0, 0.3, -0.1),
+            "market price": np.round(np.linspace(100.01, 999.99, n), 2),
+            "exchange rate": 10.37,
+        },
+        index=date_range("2015-01-01", periods=n, freq="D", name="date"),
+    )
+    c_exact = Config(_EXACT=True)
+
+    ledger = build_ledger(df, c)
+    ledger_exact = build_ledger(df, c_exact)
+
+    # NOTE: Every fourth transaction sells the last of the position, which the
+    # float calculation misses.
+    assert (ledger.transactions["held amount"].iloc[3::4] != 0).any()
+    assert (ledger_exact.transactions["held amount"].iloc[3::4] == 0).all()
+
+    years = sorted(set(df.index.year))
+    for year in years:
+        df_tax = calculate_skatteverket(year, ledger_exact, c_exact, ccy=False)
+        received, payed = df_tax["Received"].iloc[0], df_tax["Payed"].iloc[0]
+        pnl = ledger_exact.transactions.loc[str(year), "domestic P&L"].sum()
+        assert round(received + payed, 2) == round(pnl, 2)
@@ -0,0 +1,96 @@
+from datetime import date
+from io import BytesIO, StringIO
+import json
+from pathlib import Path
+import sys
+
+import numpy as np
+from pandas import DataFrame, read_csv, read_parquet
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+import src.cit.formatting
+from src.cit.formatting import Report, write_records, write_report
+
+
+@pytest.fixture
+def report():
+    df = DataFrame(
+        {"amount": [-0.4, -1.0, -2.5], "P&L": [1200.5, np.nan, -3.25]},
+        index=[date(2022, 11, 16), date(2022, 11, 17), date(2022, 12, 1)],
+    )
+    return Report(
+        df=df, title="PROFIT AND LOSS IN 2022", m={"P&L": "P&L (SEK)"}, index=True
+    )
+
+
+RECORDS = [
+    {"date": "2022-11-16", "amount": -0.4, "P&L (SEK)": 1200.5},
+    {"date": "2022-11-17", "amount": -1.0, "P&L (SEK)": None},
+    {"date": "2022-12-01", "amount": -2.5, "P&L (SEK)": -3.25},
+]
+
+
+def test_write_report_table(report):
+    f = StringIO()
+    write_report(report, "table", f)
+
+    lines = f.getvalue().splitlines()
+    assert lines[0].strip() == report.title
+    assert "P&L (SEK)" in lines[2]
+
+
+@pytest.mark.parametrize("chunk_size", [2, 100_000])
+def test_write_report_json(report, chunk_size, monkeypatch):
+    monkeypatch.setattr(src.cit.formatting, "_CHUNK_SIZE", chunk_size)
+
+    f = StringIO()
+    write_report(report, "json", f)
+    assert json.loads(f.getvalue()) == RECORDS
+
+    f = StringIO()
+    write_report(report, "jsonl", f)
+    assert [json.loads(line) for line in f.getvalue().splitlines()] == RECORDS
+
+
+def test_write_report_csv(report):
+    f = StringIO()
+    write_report(report, "csv", f)
+
+    f.seek(0)
+    df = read_csv(f).replace({np.nan: None})
+    assert df.to_dict(orient="records") == RECORDS
+
+
+def test_write_report_parquet(report):
+    pytest.importorskip("pyarrow")
+
+    f = BytesIO()
+    write_report(report, "parquet", f)
+
+    df = read_parquet(BytesIO(f.getvalue())).astype({"date": str})
+    assert df.replace({np.nan: None}).to_dict(orient="records") == RECORDS
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_write_records(report, fmt):
+    records = (
+        (day, amount, pnl)
+        for day, amount, pnl in zip(
+            report.df.index, report.df["amount"], report.df["P&L"]
+        )
+        if pnl == pnl
+    )
+
+    f = StringIO()
+    rows = write_records(records, ["amount", "P&L (SEK)"], fmt, f)
+
+    f.seek(0)
+    if fmt == "csv":
+        assert read_csv(f).to_dict(orient="records") == RECORDS[::2]
+    else:
+        assert [json.loads(line) for line in f] == RECORDS[::2]
+    assert rows == 2
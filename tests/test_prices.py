@@ -0,0 +1,114 @@
+from datetime import datetime
+from pathlib import Path
+import subprocess
+import sys
+
+from pandas import DataFrame, Timestamp
+from pandas.testing import assert_frame_equal
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+from src.cit.config import Config
+from src.cit.io import read_in_transactions
+from src.cit.prices import (
+    InMemoryProvider,
+    LocalFilesProvider,
+    PriceProvider,
+    YahooFinanceProvider,
+    get_price_provider,
+)
+
+
+@pytest.fixture
+def price_files(tmp_path):
+    (tmp_path / "BTC-USD.csv").write_text(
+        "Date,Open,Close\n"
+        "2021-10-11,56000.0,57000.0\n"
+        "2021-11-12,64000.0,65000.0\n"
+        "2022-11-16,16500.0,17000.0\n"
+    )
+    (tmp_path / "SEKUSD=X.csv").write_text(
+        "date,close\n2021-10-08,0.125\n2021-11-12,0.125\n2022-11-16,0.1\n"
+    )
+    return tmp_path
+
+
+def test_get_price_provider(price_files):
+    c = Config()
+    provider = InMemoryProvider({})
+
+    assert isinstance(get_price_provider(c), YahooFinanceProvider)
+    c._PRICES = str(price_files)
+    assert isinstance(get_price_provider(c), LocalFilesProvider)
+    c._PRICES = provider
+    assert get_price_provider(c) is provider
+
+
+def test_price_provider_without_fetch():
+    class NoFetch(PriceProvider):
+        remote = True
+
+    with pytest.raises(TypeError):
+        NoFetch()
+
+
+def test_local_files_provider(price_files):
+    provider = LocalFilesProvider(price_files)
+
+    df_test_value = provider.fetch(
+        "SEKUSD=X", datetime(2021, 10, 1), datetime(2021, 11, 12)
+    )
+    df_assert_value = DataFrame(
+        {"Open": [0.125], "Close": [0.125]}, index=[Timestamp("2021-10-08")]
+    ).rename_axis("Date")
+
+    assert_frame_equal(df_test_value, df_assert_value)
+
+
+def test_local_files_provider_system_exit(price_files):
+    provider = LocalFilesProvider(price_files)
+
+    with pytest.raises(SystemExit) as e:
+        provider.fetch("ETH-USD", datetime(2021, 10, 1), datetime(2021, 11, 12))
+
+    assert e.value.code == 1
+
+
+def test_read_in_transactions_basic_local_prices(price_files):
+    c = Config()
+    c._INPUT_FILE = "test-3.json"
+    c._PRICES = str(price_files)
+
+    df_test_value = read_in_transactions(c)
+    df_assert_value = DataFrame(
+        {
+            "amount": [0.5, 0.2, -0.4],
+            "market price": [56500.0, 64500.0, 16750.0],
+            "exchange rate": [8.0, 8.0, 10.0],
+        },
+        index=[
+            Timestamp("2021-10-12"),
+            Timestamp("2021-11-12"),
+            Timestamp("2022-11-16"),
+        ],
+    ).rename_axis(c._DATE)
+
+    assert_frame_equal(df_test_value, df_assert_value)
+
+
+def test_yfinance_is_imported_only_for_downloads():
+    code = (
+        f"import sys; sys.path.insert(0, {str(root_path)!r}); "
+        "from src.cit.config import Config; "
+        "from src.cit.io import read_input_files; "
+        "read_input_files(['test-1.json'], Config()); "
+        "print('yfinance' in sys.modules)"
+    )
+    stdout = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout
+
+    assert stdout.strip() == "False"
@@ -0,0 +1,81 @@
+from io import StringIO
+from pathlib import Path
+import sys
+from time import sleep
+
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+from src.cit import profiling
+from src.cit.calculation import build_ledger, calculate_skatteverket
+from src.cit.config import Config
+from src.cit.formatting import Report, write_report
+from src.cit.io import load_input_files
+
+
+# Default CIT configuration
+@pytest.fixture
+def configuration():
+    config = Config()
+    return config
+
+
+@pytest.fixture
+def profile():
+    yield profiling.enable()
+    profiling.disable()
+
+
+def test_stage_is_noop_when_disabled():
+    assert profiling.disable() is None
+
+    with profiling.stage("load") as stage:
+        stage.rows += 10
+
+    assert profiling.stage("load") is profiling.stage("aggregation")
+
+
+def test_stage_excludes_inner_stages(profile):
+    with profiling.stage("aggregation"):
+        sleep(0.02)
+        with profiling.stage("P&L") as stage:
+            stage.rows += 3
+            sleep(0.05)
+
+    assert profile.stages["P&L"].rows == 3
+    assert profile.stages["P&L"].seconds >= 0.05
+    assert 0.02 <= profile.stages["aggregation"].seconds < 0.05
+    assert profile.stages["aggregation"].peak_memory is None
+
+
+def test_stage_peak_memory():
+    profile = profiling.enable(memory=True)
+    try:
+        with profiling.stage("load"):
+            with profiling.stage("schema check"):
+                data = bytearray(2**20)
+            del data
+    finally:
+        profiling.disable()
+
+    assert profile.stages["schema check"].peak_memory >= 2**20
+    assert profile.stages["load"].peak_memory >= 2**20
+
+
+def test_profile_of_report(configuration, profile):
+    c = configuration
+    dataset = load_input_files(["test-2.json"], c)
+    ledger = build_ledger(dataset.transactions, c)
+    df = calculate_skatteverket(2022, ledger, c, ccy=False)
+    write_report(Report(df, title="", m={}, index=False), "csv", StringIO())
+    profiling.disable()
+
+    stages = {stage["name"]: stage for stage in profile.as_dict()["stages"]}
+    assert list(stages) == profiling.STAGES
+    assert stages["load"]["rows"] == len(dataset.transactions)
+    assert stages["acquisition prices"]["rows"] == len(dataset.transactions)
+    assert stages["formatting"]["rows"] == 1
+    assert "total" in profile.breakdown().splitlines()[-1]
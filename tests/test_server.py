@@ -0,0 +1,165 @@
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+root_path = Path(__file__).resolve().parent.parent
+# Add the root directory to the Python module search path
+sys.path.insert(0, str(root_path))
+
+import cit
+from src.cit.config import Config
+from src.cit.server import LRUCache, file_key, make_server
+
+
+# Default CIT configuration
+@pytest.fixture
+def configuration(monkeypatch):
+    config = Config()
+    monkeypatch.setattr(cit, "config", config, raising=False)
+    return config
+
+
+def test_lru_cache():
+    store = LRUCache(maxsize=2)
+    loads = []
+
+    def load(key):
+        return lambda: loads.append(key) or key.upper()
+
+    assert store.get("a", load("a")) == "A"
+    assert store.get("b", load("b")) == "B"
+    assert store.get("a", load("a")) == "A"
+    assert store.get("c", load("c")) == "C"
+    assert store.get("b", load("b")) == "B"
+
+    assert loads == ["a", "b", "c", "b"]
+    assert (store.hits, store.misses, len(store)) == (1, 4, 2)
+
+
+def test_file_key(tmp_path):
+    filename = tmp_path / "transactions.json"
+    filename.write_text("{}")
+    key = file_key([filename])
+
+    assert file_key([filename]) == key
+    filename.write_text('{"Transactions": []}')
+    assert file_key([filename]) != key
+    assert file_key([tmp_path / "missing.json"])[0][1:] == (None, None)
+
+
+@pytest.fixture
+def server():
+    def handler(argv):
+        if argv == ["fail"]:
+            return 400, "text/plain", b"failed\n"
+        return 200, "application/json", json.dumps(argv).encode()
+
+    server = make_server("127.0.0.1:0", handler)
+    thread = Thread(target=server.serve_forever)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_server(server):
+    with urlopen(server, data=b'["calculate", "summary"]') as response:
+        assert response.status == 200
+        assert json.load(response) == ["calculate", "summary"]
+
+    for body, message in [(b'["fail"]', b"failed\n"), (b"{}", b"The body must")]:
+        with pytest.raises(HTTPError) as e:
+            urlopen(server, data=body)
+        assert e.value.code == 400
+        assert e.value.read().startswith(message)
+
+
+def test_server_is_imported_only_for_serve():
+    code = (
+        f"import sys; sys.path.insert(0, {str(root_path)!r}); "
+        "import cit; "
+        "print('src.cit.server' in sys.modules)"
+    )
+    stdout = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout
+
+    assert stdout.strip() == "False"
+
+
+@pytest.fixture
+def serve_request(configuration, tmp_path, monkeypatch):
+    c = configuration
+    shutil.copy(Path(c._DATA_PATH) / "test-1.json", tmp_path)
+    c._DATA_PATH = str(tmp_path)
+    c._INPUT_FILE = "test-1.json"
+    store = LRUCache(maxsize=2)
+    calls = []
+
+    def _counted(name, f):
+        return lambda *args: calls.append(name) or f(*args)
+
+    monkeypatch.setattr(cit, "load_input_files", _counted("load", cit.load_input_files))
+    monkeypatch.setattr(cit, "build_ledger", _counted("ledger", cit.build_ledger))
+
+    def _serve_request(*argv):
+        status, content_type, body = cit._serve_request(
+            list(argv), cit._parser(c), store, c
+        )
+        return status, content_type, body.decode("utf-8")
+
+    _serve_request.calls = calls
+    return _serve_request
+
+
+def test_serve_request(serve_request):
+    status, content_type, body = serve_request("calculate", "summary")
+    assert (status, content_type) == (200, "text/plain; charset=utf-8")
+    assert "POSITION SUMMARY FOR 2022" in body
+
+    status, content_type, body = serve_request("transactions", "--format", "csv")
+    assert (status, content_type) == (200, "text/csv; charset=utf-8")
+    assert body.splitlines()[1].startswith("2021-10-12,0.5,40000.0")
+
+    for argv, message in [
+        (["batch", "clients"], "ValueError: The server runs only"),
+        (["calculate", "summary", "--out", "report.txt"], "ValueError: The server"),
+        (["calculate", "profit-and-loss", "--stream"], "ValueError: The server"),
+        (["calculate", "summary", "--checkpoint", "ckpt"], "ValueError: The server"),
+        (["calculate", "--year", "last"], "usage: cit calculate"),
+    ]:
+        status, content_type, body = serve_request(*argv)
+        assert (status, content_type) == (400, "text/plain; charset=utf-8")
+        assert body.startswith(message)
+
+
+def test_serve_request_reuses_loaded_input_files(serve_request, tmp_path):
+    serve_request("calculate", "summary")
+    serve_request("calculate", "tax-liability")
+    serve_request("forex-transactions")
+
+    # The input files are loaded and the ledger is built once
+    assert serve_request.calls == ["load", "ledger"]
+
+    # A modified input file is loaded again
+    filename = tmp_path / "test-1.json"
+    filename.write_text(filename.read_text() + "\n")
+    serve_request("calculate", "summary")
+
+    assert serve_request.calls == ["load", "ledger", "load", "ledger"]
+
+    # So is an input file with only a new modification time
+    mtime_ns = filename.stat().st_mtime_ns + 1_000_000_000
+    os.utime(filename, ns=(mtime_ns, mtime_ns))
+    serve_request("calculate", "summary")
+
+    assert serve_request.calls == ["load", "ledger"] * 3